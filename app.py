@@ -1,13 +1,28 @@
-from flask import Flask, render_template, request, jsonify, redirect, url_for, session, flash
+from flask import Flask, render_template as flask_render_template, request, jsonify, redirect, url_for, session, flash, stream_with_context, g, abort, send_file
 from flask_login import LoginManager, UserMixin, login_user, login_required, logout_user, current_user
 from flask_sqlalchemy import SQLAlchemy
-from werkzeug.security import generate_password_hash, check_password_hash
+from sqlalchemy.orm import make_transient_to_detached
 from authlib.integrations.flask_client import OAuth
 import os
+import glob
+import hashlib
+import time
+import threading
+import mimetypes
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from functools import wraps
+from werkzeug.utils import safe_join
 from dotenv import load_dotenv
 
 load_dotenv() # Load environment variables from .env file
 from utils import analiz
+from utils import streaming
+from utils import metrics
+from utils import thumbnails
+from utils import export
+from utils import passwords
+from utils import assets
 
 app = Flask(__name__)
 app.config['SECRET_KEY'] = os.environ.get('SECRET_KEY', 'default-dev-secret-key')
@@ -16,6 +31,28 @@ if app.config['SQLALCHEMY_DATABASE_URI'].startswith("postgres://"):
     app.config['SQLALCHEMY_DATABASE_URI'] = app.config['SQLALCHEMY_DATABASE_URI'].replace("postgres://", "postgresql://", 1)
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
 
+def engine_options(uri):
+    # Connection pool per worker process: a few connections for the request
+    # threads, checked before use since Postgres may drop idle ones
+    if uri.startswith('sqlite'):
+        if uri in ('sqlite://', 'sqlite:///:memory:'):
+            return {}
+        # Let writers wait for each other instead of failing with "database is locked"
+        return {'connect_args': {'timeout': 15, 'check_same_thread': False}}
+    return {
+        'pool_size': int(os.environ.get('DB_POOL_SIZE', '5')),
+        'max_overflow': int(os.environ.get('DB_MAX_OVERFLOW', '5')),
+        'pool_timeout': 10,
+        'pool_recycle': 1800,
+        'pool_pre_ping': True
+    }
+
+app.config['SQLALCHEMY_ENGINE_OPTIONS'] = engine_options(app.config['SQLALCHEMY_DATABASE_URI'])
+# Adds a Server-Timing header with the analiz stage breakdown to every response
+app.config['SERVER_TIMING'] = os.environ.get('SERVER_TIMING') == '1'
+# /metrics requires "Authorization: Bearer <token>"; unset keeps it closed
+app.config['METRICS_TOKEN'] = os.environ.get('METRICS_TOKEN')
+
 # Initialize Extensions
 db = SQLAlchemy(app)
 login_manager = LoginManager(app)
@@ -30,7 +67,8 @@ google = oauth.register(
     name='google',
     client_id=GOOGLE_CLIENT_ID,
     client_secret=GOOGLE_CLIENT_SECRET,
-    server_metadata_url='https://accounts.google.com/.well-known/openid-configuration',
+    # Overridable for tests against a local OAuth server (see bench/load_test.py)
+    server_metadata_url=os.environ.get('GOOGLE_METADATA_URL', 'https://accounts.google.com/.well-known/openid-configuration'),
     client_kwargs={'scope': 'openid email profile'},
 )
 
@@ -43,9 +81,178 @@ class User(UserMixin, db.Model):
     google_id = db.Column(db.String(100), unique=True, nullable=True)
     profile_pic = db.Column(db.String(1000))
 
+# Request timing
+@app.before_request
+def start_timer():
+    g.request_start = time.perf_counter()
+    metrics.start_request()
+
+@app.after_request
+def record_timing(response):
+    start = g.pop('request_start', None)
+    spans = metrics.finish_request()
+    if start is None:
+        return response
+    elapsed = time.perf_counter() - start
+    route = request.url_rule.rule if request.url_rule else 'unmatched'
+    metrics.observe('pacific_request_duration_seconds', (('route', route), ('method', request.method)), elapsed)
+    metrics.increment('pacific_requests_total', (('route', route), ('status', response.status_code)))
+    if app.config['SERVER_TIMING']:
+        response.headers['Server-Timing'] = metrics.server_timing_header(spans, elapsed)
+    return response
+
+# Static assets: hashed, compressed and resized copies from `python -m utils.assets`
+ASSET_MANIFEST = assets.load_manifest()
+ASSET_MAX_AGE = 31536000
+
+def asset_url_for(endpoint, **values):
+    """
+    url_for() for templates: url_for('static', filename=...) points at the
+    file's hashed copy when the asset build has one.
+    """
+    if endpoint == 'static':
+        entry = ASSET_MANIFEST.get(values.get('filename'))
+        if entry is not None:
+            values['filename'] = 'dist/' + entry['file']
+    return url_for(endpoint, **values)
+
+def asset_srcset(filename, image_format):
+    """
+    Returns the srcset of an image's resized variants in 'webp' or 'avif', or "" if there are none.
+    """
+    variants = ASSET_MANIFEST.get(filename, {}).get('variants', {}).get(image_format)
+    if not variants:
+        return ""
+    return ', '.join(f"{url_for('static', filename='dist/' + name)} {width}w" for width, name in variants)
+
+app.jinja_env.globals.update(url_for=asset_url_for, asset_srcset=asset_srcset)
+
+def render_template(template_name, **context):
+    with metrics.span(f'render_{template_name}'):
+        return flask_render_template(template_name, **context)
+
+# Conditional GET for data-backed routes
+# Templates and code change on deploy, so they are part of every ETag too
+CODE_VERSION = hashlib.sha1(repr(sorted(
+    (path, os.path.getmtime(path))
+    for path in [__file__] + glob.glob(os.path.join(app.root_path, 'templates', '*.html'))
+        + glob.glob(os.path.join(app.root_path, 'utils', '*.py'))
+        + glob.glob(assets.MANIFEST_PATH)
+)).encode('utf-8')).hexdigest()[:8]
+
+RESPONSE_CACHE_SIZE = 128
+_response_cache = OrderedDict()
+_response_cache_lock = threading.Lock()
+
+def dataset_cached(memoize=False, uncached_args=()):
+    """
+    Sends a strong ETag and Last-Modified derived from the Datas/ files and
+    answers 304 before the view (and any analiz code) runs.
+    Only If-None-Match is honored: a date alone cannot tell query strings
+    or deploys apart, so If-Modified-Since always gets the full response.
+    With memoize=True the response body is kept per (route, args, version).
+    Requests carrying one of uncached_args (e.g. DataTables' draw counter,
+    new on every call) skip both: they would never match again.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapped(*args, **kwargs):
+            if any(arg in request.args for arg in uncached_args):
+                response = app.make_response(view(*args, **kwargs))
+                response.headers['Cache-Control'] = 'private, no-store'
+                return response
+            version, last_modified = analiz.get_served_version()
+            # jQuery's cache buster (_=<timestamp>) does not change the body
+            query = sorted(item for item in request.args.items(multi=True) if item[0] != '_')
+            # Compressed and plain bodies must not share a strong ETag
+            encoding = request.headers.get('Accept-Encoding', '')
+            etag = hashlib.sha1(repr((CODE_VERSION, version, request.path, query, encoding)).encode('utf-8')).hexdigest()
+
+            not_modified = bool(request.if_none_match) and request.if_none_match.contains(etag)
+
+            metrics.cache_event('conditional_get', not_modified)
+            if not_modified:
+                response = app.response_class(status=304)
+            else:
+                cached = None
+                if memoize:
+                    with _response_cache_lock:
+                        cached = _response_cache.get(etag)
+                        if cached is not None:
+                            _response_cache.move_to_end(etag)
+                    metrics.cache_event('response', cached is not None)
+                if cached is not None:
+                    response = app.response_class(cached[0], mimetype=cached[1])
+                else:
+                    response = app.make_response(view(*args, **kwargs))
+                    if response.cache_control.no_store:
+                        # The view marked this response as incomplete, do not cache it anywhere
+                        return response
+                    if memoize and response.status_code == 200 and not response.is_streamed:
+                        with _response_cache_lock:
+                            _response_cache[etag] = (response.get_data(), response.mimetype)
+                            while len(_response_cache) > RESPONSE_CACHE_SIZE:
+                                _response_cache.popitem(last=False)
+
+            response.set_etag(etag)
+            if last_modified:
+                response.last_modified = last_modified
+            # Behind login: browsers may keep it but must revalidate
+            response.headers['Cache-Control'] = 'private, no-cache'
+            return response
+        return wrapped
+    return decorator
+
+# Users are loaded on every authenticated request, so each process keeps them
+# for a short while. Changes made in another worker show up after USER_CACHE_TTL.
+USER_CACHE_TTL = float(os.environ.get('USER_CACHE_TTL', '30'))
+USER_CACHE_SIZE = 1024
+_user_cache = OrderedDict()
+_user_cache_lock = threading.Lock()
+
+def invalidate_user(user_id):
+    """
+    Drops a user from this process's cache after the account changed.
+    """
+    with _user_cache_lock:
+        _user_cache.pop(int(user_id), None)
+
 @login_manager.user_loader
 def load_user(user_id):
-    return db.session.get(User, int(user_id))
+    user_id = int(user_id)
+    now = time.monotonic()
+    with _user_cache_lock:
+        cached = _user_cache.get(user_id)
+        if cached is not None and cached[0] > now:
+            _user_cache.move_to_end(user_id)
+        else:
+            cached = None
+    metrics.cache_event('user', cached is not None)
+    if cached is not None:
+        # Attach a copy to this request's session without a SELECT, so views can still update it
+        return db.session.merge(cached[1], load=False)
+
+    user = db.session.get(User, user_id)
+    if user is not None:
+        detached = User(**{column.name: getattr(user, column.name) for column in User.__table__.columns})
+        make_transient_to_detached(detached)
+        with _user_cache_lock:
+            _user_cache[user_id] = (now + USER_CACHE_TTL, detached)
+            while len(_user_cache) > USER_CACHE_SIZE:
+                _user_cache.popitem(last=False)
+    return user
+
+@app.errorhandler(passwords.Busy)
+def password_hashing_busy(e):
+    # Too many logins at once: ask to retry instead of queueing more CPU work
+    message = 'Sunucu şu anda yoğun, lütfen birazdan tekrar deneyin.'
+    if request.is_json:
+        response = jsonify({'success': False, 'message': message})
+        response.status_code = 503
+        response.headers['Retry-After'] = '2'
+        return response
+    flash(message, 'danger')
+    return redirect(request.path)
 
 @app.route('/')
 def home():
@@ -62,7 +269,7 @@ def login():
     
     user = User.query.filter_by(email=email).first()
     
-    if not user or not user.password or not check_password_hash(user.password, password):
+    if not user or not user.password or not passwords.check_password(user.password, password):
         return jsonify({'success': False, 'message': 'Hatalı email veya şifre.'}), 401
     
     login_user(user)
@@ -82,7 +289,7 @@ def signup():
     new_user = User(
         email=email,
         name=name,
-        password=generate_password_hash(password, method='scrypt')
+        password=passwords.hash_password(password)
     )
     
     db.session.add(new_user)
@@ -124,6 +331,7 @@ def google_callback():
             user.google_id = user_info['id']
             user.profile_pic = user_info['picture']
             db.session.commit()
+            invalidate_user(user.id)
             
         login_user(user)
         return redirect(url_for('report'))
@@ -131,10 +339,64 @@ def google_callback():
         print(f"Google Auth Error: {e}")
         return redirect(url_for('home'))
 
+def bad_request(message):
+    # Ends the request with the same JSON error body the API views return
+    response = jsonify({'success': False, 'message': message})
+    response.status_code = 400
+    abort(response)
+
+def parse_date_arg(name):
+    # Returns the YYYY-MM-DD query param as a datetime, or None if missing
+    value = request.args.get(name)
+    if not value:
+        return None
+    try:
+        return datetime.strptime(value, '%Y-%m-%d')
+    except ValueError:
+        bad_request(f'Geçersiz tarih: {name}={value} (YYYY-AA-GG bekleniyor)')
+
+def parse_int_arg(name, default, low, high):
+    # Returns the integer query param, or default if missing; 400 outside low..high
+    value = request.args.get(name)
+    if value is None:
+        return default
+    try:
+        number = int(value)
+    except ValueError:
+        number = None
+    if number is None or not low <= number <= high:
+        bad_request(f'Geçersiz değer: {name}={value} ({low}-{high} arası olmalı)')
+    return number
+
+def parse_trend_args():
+    # Trend window: ?days=7|30|90 or a custom ?start=YYYY-MM-DD&end=YYYY-MM-DD (inclusive)
+    trend_days = parse_int_arg('days', None, 1, analiz.MAX_TREND_DAYS)
+    trend_start = parse_date_arg('start')
+    trend_end = parse_date_arg('end')
+    if trend_end is not None:
+        trend_end += timedelta(days=1)
+    return trend_days, trend_start, trend_end
+
+def send_exported(name, fragment):
+    """
+    Sends the fragment from the nightly export (python -m utils.export)
+    if it was built from the current data and the request has no
+    arguments it would ignore. Returns None otherwise.
+    """
+    if request.args:
+        return None
+    path = export.find(analiz.get_served_version()[0], name, fragment)
+    if path is None:
+        return None
+    metrics.increment('pacific_export_hits_total', (('fragment', fragment),))
+    return send_file(path, mimetype='application/json', conditional=False, etag=False, max_age=None)
+
 @app.route('/report')
 @login_required
+@dataset_cached()
 def report():
-    # Get all available names from data directory
+    # Only the page shell: KPIs, top posts and charts are loaded
+    # from the /api/report/<name>/... fragments after the first paint
     names = analiz.get_all_names()
     
     # Get selected name from query param, default to first name if available
@@ -142,20 +404,71 @@ def report():
     if not selected_name and names:
         selected_name = names[0]
     
-    kpi_data = {}
-    top_posts = []
-    city = "Sivas" # Default fallback
-    chart_data = {}
-    
-    if selected_name:
-        analysis_result = analiz.analyze_data(selected_name)
-        if analysis_result:
-            kpi_data = analysis_result['kpi_data']
-            top_posts = analysis_result['top_posts']
-            city = analysis_result.get('city', "Sivas")
-            chart_data = analysis_result.get('chart_data', {})
+    city = analiz.get_registry().city(selected_name, "Sivas") if selected_name else "Sivas"
+
+    return render_template('index.html', names=names, selected_name=selected_name, city=city, user=current_user)
+
+@app.route('/api/report/<name>/kpi')
+@login_required
+@dataset_cached(memoize=True)
+def report_kpi(name):
+    exported = send_exported(name, 'kpi')
+    if exported is not None:
+        return exported
+    result = analiz.get_profile_kpis(name, *parse_trend_args())
+    if result is None:
+        abort(404)
+    result['city'] = analiz.get_registry().city(name, "Sivas")
+    return jsonify(result)
+
+@app.route('/api/report/<name>/charts')
+@login_required
+@dataset_cached(memoize=True)
+def report_charts(name):
+    exported = send_exported(name, 'charts')
+    if exported is not None:
+        return exported
+    if analiz.get_store().get(name) is None:
+        abort(404)
+    return jsonify({
+        "chart_data": analiz.get_chart_data(name),
+        "chart_comparison": analiz.get_chart_comparison(name)
+    })
+
+@app.route('/api/report/<name>/followers')
+@login_required
+@dataset_cached(memoize=True)
+def report_followers(name):
+    exported = send_exported(name, 'followers')
+    if exported is not None:
+        return exported
+    granularity = request.args.get('granularity', 'daily')
+    if granularity not in ('raw', 'daily', 'weekly'):
+        bad_request(f'Geçersiz aralık: {granularity}')
+    if analiz.get_store().get(name) is None:
+        abort(404)
+    end = parse_date_arg('end')
+    if end is not None:
+        end += timedelta(days=1)
+    return jsonify(analiz.get_follower_history(name, granularity, parse_date_arg('start'), end))
 
-    return render_template('index.html', names=names, selected_name=selected_name, kpi_data=kpi_data, top_posts=top_posts, city=city, chart_data=chart_data, user=current_user)
+@app.route('/api/report/<name>/top-posts')
+@login_required
+@dataset_cached()
+def report_top_posts(name):
+    exported = send_exported(name, 'top-posts')
+    if exported is not None:
+        return exported
+    top_posts = analiz.get_profile_top_posts(name)
+    if top_posts is None:
+        abort(404)
+    # Thumbnails that missed the deadline keep loading in the background;
+    # the page asks again instead of the browser caching the gaps
+    pending = any(not post['image'] for post in top_posts)
+    response = jsonify({"top_posts": top_posts, "pending": pending})
+    if pending:
+        response.cache_control.no_store = True
+    return response
 
 @app.route('/all-posts')
 @login_required
@@ -167,22 +480,136 @@ def all_posts():
     # But for now, let's stick to the plan: pass regions to template
     
     # Optimization: Just get unique regions from profile_tags
-    region_map = analiz.get_region_map()
-    regions = sorted(list(set(region_map.values())))
+    regions = analiz.get_registry().all_regions()
     return render_template('all_posts.html', regions=regions)
 
+MAX_PAGE_LENGTH = 1000
+
+def stream_all_posts(compact=False):
+    """
+    Streams all posts as JSON, chunk by chunk, compressed with the best
+    encoding the client accepts. compact=True sends columns + rows arrays.
+    """
+    index = analiz.get_post_index()
+    body = streaming.json_rows(index.iter_chunks(), analiz.POST_FIELDS, compact=compact)
+
+    encoding = request.accept_encodings.best_match(streaming.supported_encodings() + ['identity'])
+    if encoding == 'identity':
+        encoding = None
+    response = app.response_class(
+        stream_with_context(streaming.compress(body, encoding)),
+        mimetype='application/json'
+    )
+    if encoding:
+        response.headers['Content-Encoding'] = encoding
+    response.headers['Vary'] = 'Accept-Encoding'
+    return response
+
 @app.route('/api/all-posts')
 @login_required
+@dataset_cached(uncached_args=('draw',))
 def api_all_posts():
-    posts = analiz.get_all_posts_data()
+    # Without DataTables' draw counter, stream every post
+    if 'draw' not in request.args:
+        return stream_all_posts(compact=request.args.get('format') == 'compact')
+
+    # DataTables server-side protocol
+    index = analiz.get_post_index()
+    start = request.args.get('start', 0, type=int)
+    length = request.args.get('length', 25, type=int)
+    if length < 0 or length > MAX_PAGE_LENGTH:
+        length = MAX_PAGE_LENGTH
+    order_column = request.args.get('order[0][column]', 2, type=int)
+    order_by = request.args.get(f'columns[{order_column}][data]', 'reach_rate')
+    descending = request.args.get('order[0][dir]', 'desc') != 'asc'
+    search = request.args.get('search[value]', '')
+
+    # Comma separated region list; missing means no region filter
+    regions = request.args.get('regions')
+    if regions is not None:
+        regions = [r for r in regions.split(',') if r]
+
+    records_filtered, posts = index.query(
+        start=start, length=length, order_by=order_by,
+        descending=descending, search=search, regions=regions
+    )
+    return jsonify({
+        'draw': request.args.get('draw', 0, type=int),
+        'recordsTotal': len(index),
+        'recordsFiltered': records_filtered,
+        'data': posts
+    })
+
+MAX_TOP_K = 500
+
+@app.route('/api/top-posts')
+@login_required
+@dataset_cached(memoize=True)
+def api_top_posts():
+    # e.g. /api/top-posts?metric=reach_rate&k=50&region=Ege&type=Reel&since=2025-11-01
+    metric = request.args.get('metric', 'reach_rate')
+    if metric not in analiz.RANKING_METRICS:
+        return jsonify({'success': False, 'message': f'Geçersiz metrik: {metric}'}), 400
+    k = parse_int_arg('k', 50, 1, MAX_TOP_K)
+    until = parse_date_arg('until')
+    if until is not None:
+        until += timedelta(days=1)
+
+    posts = analiz.get_top_posts(
+        metric=metric,
+        k=k,
+        region=request.args.get('region') or None,
+        post_type=request.args.get('type') or None,
+        since=parse_date_arg('since'),
+        until=until,
+        by_percentile=request.args.get('rank') == 'percentile'
+    )
     return jsonify({'data': posts})
 
+MAX_ANOMALIES = 1000
+
+@app.route('/api/anomalies')
+@login_required
+@dataset_cached(memoize=True)
+def api_anomalies():
+    # Posts far above or below their mayor's usual engagement, e.g. /api/anomalies?kind=viral&region=Ege
+    kind = request.args.get('kind') or None
+    if kind not in (None, 'viral', 'low'):
+        return jsonify({'success': False, 'message': f'Geçersiz tür: {kind}'}), 400
+    limit = parse_int_arg('limit', 100, 1, MAX_ANOMALIES)
+    total, posts = analiz.get_anomalies(
+        mayor=request.args.get('mayor') or None,
+        kind=kind,
+        region=request.args.get('region') or None,
+        limit=limit
+    )
+    return jsonify({'total': total, 'data': posts})
+
+MAX_SEARCH_RESULTS = 100
+
+@app.route('/api/search')
+@login_required
+@dataset_cached(memoize=True)
+def api_search():
+    # Caption and hashtag search, e.g. /api/search?q=#izmir kültür
+    q = request.args.get('q', '').strip()
+    limit = parse_int_arg('limit', 20, 1, MAX_SEARCH_RESULTS)
+    if not q:
+        return jsonify({'query': q, 'total': 0, 'data': [], 'facets': {}})
+    total, posts, facets = analiz.get_post_search().query(q, limit)
+    return jsonify({'query': q, 'total': total, 'data': posts, 'facets': facets})
+
 @app.route('/mayors')
 @login_required
+@dataset_cached()
 def mayors():
     mayors_data = analiz.get_mayors_data()
-    # Extract unique regions for the filter
-    regions = sorted(list(set(m['region'] for m in mayors_data if m['region'])))
+    # Regions for the filter come precomputed from profile_tags; untagged
+    # mayors land in the registry's fallback bucket ("Bilinmiyor"), so keep it
+    regions = analiz.get_registry().all_regions()
+    fallback = {m['region'] for m in mayors_data if m['region']} - set(regions)
+    if fallback:
+        regions = sorted(set(regions) | fallback)
     return render_template('mayors.html', mayors=mayors_data, regions=regions)
 
 @app.route('/axioms')
@@ -202,13 +629,14 @@ def account():
 
             if not current_user.password:
                 flash('Google ile giriş yapan kullanıcılar şifre değiştiremez.', 'danger')
-            elif not check_password_hash(current_user.password, current_password):
+            elif not passwords.check_password(current_user.password, current_password):
                 flash('Mevcut şifre hatalı.', 'danger')
             elif new_password != confirm_password:
                 flash('Yeni şifreler eşleşmiyor.', 'danger')
             else:
-                current_user.password = generate_password_hash(new_password, method='scrypt')
+                current_user.password = passwords.hash_password(new_password)
                 db.session.commit()
+                invalidate_user(current_user.id)
                 flash('Şifreniz başarıyla güncellendi.', 'success')
         
         # Check if it's a name update (if we decide to add it back later or if hidden)
@@ -217,6 +645,7 @@ def account():
             if name:
                 current_user.name = name
                 db.session.commit()
+                invalidate_user(current_user.id)
                 flash('Profil bilgileriniz güncellendi.', 'success')
             else:
                 flash('İsim alanı boş bırakılamaz.', 'danger')
@@ -227,12 +656,55 @@ def account():
 @app.route('/delete-account', methods=['POST'])
 @login_required
 def delete_account():
-    user = current_user
+    user = current_user._get_current_object()
     logout_user()
     db.session.delete(user)
     db.session.commit()
+    invalidate_user(user.id)
     return redirect(url_for('home'))
 
+@app.route('/static/dist/<path:filename>')
+def static_asset(filename):
+    # Built files never change under the same name; text files have .br/.gz siblings
+    path = safe_join(assets.BUILD_DIR, filename)
+    if path is None or not os.path.isfile(path):
+        abort(404)
+    available = [encoding for encoding, suffix in assets.ENCODINGS.items() if os.path.isfile(path + suffix)]
+    encoding = request.accept_encodings.best_match(available + ['identity']) if available else 'identity'
+    mimetype = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+    if encoding in assets.ENCODINGS:
+        response = send_file(path + assets.ENCODINGS[encoding], mimetype=mimetype, max_age=ASSET_MAX_AGE)
+        response.headers['Content-Encoding'] = encoding
+    else:
+        response = send_file(path, mimetype=mimetype, max_age=ASSET_MAX_AGE)
+    if available:
+        response.headers['Vary'] = 'Accept-Encoding'
+    response.headers['Cache-Control'] = f'public, max-age={ASSET_MAX_AGE}, immutable'
+    return response
+
+@app.route('/thumbnails/<digest>.webp')
+@login_required
+def thumbnail(digest):
+    # Content-addressed: a digest never changes, so browsers can keep it forever
+    if len(digest) != 32 or any(c not in '0123456789abcdef' for c in digest):
+        abort(404)
+    path = thumbnails.path_for(digest)
+    if not os.path.exists(path):
+        abort(404)
+    response = send_file(path, mimetype='image/webp', conditional=False, etag=False)
+    response.headers['Cache-Control'] = 'private, max-age=31536000, immutable'
+    return response
+
+@app.route('/metrics')
+def metrics_endpoint():
+    # Prometheus text format, merged across workers when METRICS_DIR is set
+    token = app.config['METRICS_TOKEN']
+    if not token:
+        abort(404)
+    if request.headers.get('Authorization') != f'Bearer {token}':
+        abort(401)
+    return app.response_class(metrics.render_prometheus(), mimetype='text/plain; version=0.0.4')
+
 if __name__ == '__main__':
     with app.app_context():
         db.create_all()
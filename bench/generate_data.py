@@ -0,0 +1,158 @@
+"""
+Writes a synthetic Datas/ directory: one *Main.csv per profile with the
+same columns and quirks as the scraped files, plus a matching
+profile_tags.csv.
+
+    python bench/generate_data.py /tmp/bench-data --profiles 81 --posts 90
+    python bench/generate_data.py /tmp/bench-big --profiles 1000 --posts 10000
+    python bench/generate_data.py /tmp/bench-zip --compress zip
+"""
+import io
+import os
+import csv
+import gzip
+import shutil
+import zipfile
+import random
+import argparse
+from datetime import datetime, timedelta
+
+COLUMNS = ['PostLink', 'PostTürü', 'BeğeniSayısı', 'YorumSayısı', 'Görüntülenme Sayısı',
+           'Tarih', 'DisplayPhoto', 'Caption', 'Takipçi', 'TahminMi']
+TAG_COLUMNS = ['Profil', 'Tag1', 'Tag2', 'Tag3', 'Tag4', 'Tag5']
+
+REGIONS = ['Akdeniz', 'Doğu Anadolu', 'Ege', 'Güneydoğu Anadolu', 'Karadeniz', 'Marmara', 'İç Anadolu']
+METRO = ['Büyükşehir', 'Büyükşehir Olmayan']
+# Share of each post type in the real data
+POST_TYPES = [('Carousel', 0.44), ('Reels', 0.31), ('Photo', 0.25), ('Video', 0.001)]
+WORDS = ['Şehrimiz', 'için', 'çalışmaya', 'devam', 'ediyoruz', 'hemşehrilerimiz', 'ile', 'buluştuk',
+         'İstanbul', 'ılık', 'güzel', 'bir', 'gün', 'proje', 'açılış', 'törenimize', 'davetlisiniz']
+HASHTAGS = ['#belediye', '#hizmet', '#Şehrimiz', '#İzmir', '#gençlik', '#kültür', '#spor']
+
+LINK_CHARS = 'ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789_-'
+
+def random_shortcode(rng):
+    return ''.join(rng.choice(LINK_CHARS) for _ in range(11))
+
+def random_caption(rng, words):
+    parts = [rng.choice(WORDS) for _ in range(words)]
+    parts += rng.sample(HASHTAGS, rng.randint(0, 3))
+    return ' '.join(parts)
+
+def display_photo(rng):
+    # Long signed CDN URL with an expiry (oe=) parameter, like the real ones
+    return (
+        f"https://scontent.cdninstagram.com/v/t51.71878-15/{rng.getrandbits(64)}_n.jpg"
+        f"?stp=dst-jpg_e15_tt6&_nc_cat={rng.randint(100, 120)}&ccb=7-5&_nc_sid=58cdad"
+        f"&_nc_ohc={random_shortcode(rng)}&oh=00_{random_shortcode(rng) * 3}&oe={rng.getrandbits(32):08X}"
+    )
+
+def stub_image(width=1080, height=1350):
+    """
+    Returns a JPEG the size of an Instagram portrait post, or b"" without Pillow.
+    """
+    try:
+        from PIL import Image
+    except ImportError:
+        return b""
+    out = io.BytesIO()
+    Image.new('RGB', (width, height), (240, 120, 40)).save(out, 'JPEG', quality=85)
+    return out.getvalue()
+
+def write_profile(path, rng, posts, end_date, caption_words, legacy_date_share):
+    followers = int(rng.lognormvariate(11, 1.2)) + 1000
+    base_rate = rng.uniform(0.005, 0.08)
+    types = [t for t, _ in POST_TYPES]
+    weights = [w for _, w in POST_TYPES]
+
+    date = end_date
+    with open(path, 'w', encoding='utf-8-sig', newline='') as f:
+        writer = csv.writer(f, delimiter=';')
+        writer.writerow(COLUMNS)
+        for i in range(posts):
+            post_type = rng.choices(types, weights)[0]
+            likes = int(followers * base_rate * rng.lognormvariate(0, 0.9))
+            comments = int(likes * rng.uniform(0.005, 0.05))
+            views = int(likes * rng.uniform(8, 40)) if post_type in ('Reels', 'Video') else ''
+            date -= timedelta(minutes=rng.randint(60, 60 * 30))
+            # A few older scrapes used a different date format
+            if rng.random() < legacy_date_share:
+                tarih = f"{date.day}.{date.month:02d}.{date.year} {date:%H:%M}"
+            else:
+                tarih = date.strftime('%Y-%m-%d %H:%M:%S')
+            writer.writerow([
+                f"https://www.instagram.com/p/{random_shortcode(rng)}/",
+                post_type,
+                likes,
+                comments,
+                views,
+                tarih,
+                display_photo(rng),
+                random_caption(rng, caption_words),
+                # Only the first row carries the follower count
+                f"{float(followers)}" if i == 0 else '',
+                1 if rng.random() < 0.05 else 0
+            ])
+
+def compress_profiles(out_dir, names, compress):
+    """
+    Replaces the *Main.csv files with one Datas.zip ('zip') or *Main.csv.gz files ('gz').
+    """
+    paths = [os.path.join(out_dir, f"{name}Main.csv") for name in names]
+    if compress == 'zip':
+        with zipfile.ZipFile(os.path.join(out_dir, 'Datas.zip'), 'w', zipfile.ZIP_DEFLATED) as zf:
+            for path in paths:
+                zf.write(path, os.path.basename(path))
+    else:
+        for path in paths:
+            with open(path, 'rb') as src, gzip.open(path + '.gz', 'wb') as dst:
+                shutil.copyfileobj(src, dst)
+    for path in paths:
+        os.remove(path)
+
+def generate(out_dir, profiles, posts, seed=0, caption_words=30, legacy_date_share=0.02, compress=None):
+    """
+    Writes `profiles` *Main.csv files with `posts` rows each and a profile_tags.csv.
+    compress='zip' or 'gz' stores the profiles compressed instead.
+    Returns the list of profile names.
+    """
+    rng = random.Random(seed)
+    os.makedirs(out_dir, exist_ok=True)
+    end_date = datetime(2025, 11, 29, 21, 0)
+    names = [f"Başkan Çağrı {i:04d}" for i in range(profiles)]
+
+    for name in names:
+        write_profile(os.path.join(out_dir, f"{name}Main.csv"), rng, posts, end_date,
+                      caption_words, legacy_date_share)
+
+    with open(os.path.join(out_dir, 'profile_tags.csv'), 'w', encoding='utf-8-sig', newline='') as f:
+        writer = csv.writer(f, delimiter=';')
+        writer.writerow(TAG_COLUMNS)
+        for i, name in enumerate(names):
+            writer.writerow([
+                name,
+                REGIONS[i % len(REGIONS)],
+                rng.choice(METRO),
+                f"Şehir {i % 81:02d}",
+                f"baskan{i:04d}",
+                ''
+            ])
+
+    if compress:
+        compress_profiles(out_dir, names, compress)
+    return names
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('out_dir')
+    parser.add_argument('--profiles', type=int, default=81)
+    parser.add_argument('--posts', type=int, default=90)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--caption-words', type=int, default=30)
+    parser.add_argument('--compress', choices=['zip', 'gz'], help='Store the profiles as Datas.zip or *.csv.gz')
+    args = parser.parse_args()
+    names = generate(args.out_dir, args.profiles, args.posts, args.seed, args.caption_words, compress=args.compress)
+    print(f"Wrote {len(names)} profiles x {args.posts} posts to {args.out_dir}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,419 @@
+"""
+Boots app:app under gunicorn on localhost and drives a mixed dashboard
+workload at stepped concurrency levels, to see how many concurrent users
+one box can take.
+
+    python bench/load_test.py --workers 4 --threads 4 --steps 1,10,25,50 --duration 30
+    python bench/load_test.py --data-dir Datas --baseline bench/loadtest-abc1234.json
+
+Every virtual user has its own account in a fresh SQLite users.db and logs
+in through /login, or through /google-login and /auth/callback against a
+local OAuth stand-in (--google-share). It then browses like the dashboard
+does: /report?name=... with its fragments, /mayors, /all-posts with the
+full /api/all-posts download, and DataTables pages of /api/all-posts,
+revalidating with ETags like a browser.
+
+Per step and route it reports throughput, p50/p95/p99 latency and error
+rate, written as JSON. Post images are fetched once with stubs before the
+server starts, so the server never waits on Instagram.
+"""
+import os
+import sys
+import json
+import time
+import random
+import shutil
+import socket
+import tempfile
+import argparse
+import platform
+import threading
+import subprocess
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlsplit, parse_qs, urlencode, quote
+import requests
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import generate_data
+from run_benchmarks import git_commit, percentile
+
+PASSWORD = 'loadtest-password'
+REQUEST_TIMEOUT = 60
+
+# Share of user actions; a report view also loads its four fragments
+WORKLOAD = {
+    'report': 50,
+    'mayors': 15,
+    'all_posts': 10,
+    'all_posts_page': 25
+}
+REPORT_FRAGMENTS = ['kpi', 'charts', 'followers', 'top-posts']
+SORT_COLUMNS = ['mayor', 'city', 'reach_rate', 'likes', 'comments', 'type', 'region']
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+class OAuthStub(ThreadingHTTPServer):
+    """
+    Local stand-in for Google's OpenID provider: discovery document,
+    an authorize endpoint that approves at once, token and userinfo.
+    The authorization code names the user, so each virtual user gets
+    its own Google account.
+    """
+    daemon_threads = True
+
+    def __init__(self):
+        super().__init__(('127.0.0.1', free_port()), OAuthStubHandler)
+        self.base_url = f"http://127.0.0.1:{self.server_address[1]}"
+        self.metadata_url = self.base_url + '/.well-known/openid-configuration'
+
+class OAuthStubHandler(BaseHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+    def _json(self, data):
+        body = json.dumps(data).encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        query = {key: values[0] for key, values in parse_qs(url.query).items()}
+        base = self.server.base_url
+        if url.path == '/.well-known/openid-configuration':
+            self._json({
+                'issuer': base,
+                'authorization_endpoint': base + '/authorize',
+                'token_endpoint': base + '/token',
+                'userinfo_endpoint': base + '/userinfo',
+                'jwks_uri': base + '/jwks'
+            })
+        elif url.path == '/authorize':
+            # login_hint carries the virtual user's id (see VirtualUser.login)
+            code = query.get('login_hint', 'user')
+            self.send_response(302)
+            self.send_header('Location', query['redirect_uri'] + '?' + urlencode({'code': code, 'state': query.get('state', '')}))
+            self.end_headers()
+        elif url.path == '/userinfo':
+            user = self.headers.get('Authorization', '').split(' ')[-1]
+            self._json({
+                'id': f'google-{user}',
+                'sub': f'google-{user}',
+                'email': f'{user}@google.loadtest',
+                'name': f'Google {user}',
+                'picture': ''
+            })
+        elif url.path == '/jwks':
+            self._json({'keys': []})
+        else:
+            self.send_error(404)
+
+    def do_POST(self):
+        if urlsplit(self.path).path != '/token':
+            self.send_error(404)
+            return
+        length = int(self.headers.get('Content-Length', 0))
+        form = {key: values[0] for key, values in parse_qs(self.rfile.read(length).decode('utf-8')).items()}
+        # The access token is the user id again, for /userinfo
+        self._json({'access_token': form.get('code', 'user'), 'token_type': 'Bearer', 'expires_in': 3600})
+
+def prepare_app(env, users):
+    """
+    Seeds the password users and caches every top post image with stubs,
+    in this process, before the server starts.
+    """
+    os.environ.update(env)
+    import app as webapp
+    from utils import analiz, og_image, thumbnails, passwords
+
+    og_image.fetch_og_image = lambda link: "https://example.invalid/stub.jpg"
+    thumbnails.download_image = lambda url: generate_data.stub_image()
+    with webapp.app.app_context():
+        webapp.db.create_all()
+        for i in range(users):
+            webapp.db.session.add(webapp.User(
+                email=f'user{i}@loadtest', name=f'User {i}', password=passwords.hash_password(PASSWORD)
+            ))
+        webapp.db.session.commit()
+
+    names = analiz.get_all_names()
+    for name in names:
+        analiz.get_profile_top_posts(name, deadline=30)
+    return names
+
+def start_server(args, env, port):
+    if args.server == 'gunicorn':
+        command = [
+            sys.executable, '-m', 'gunicorn', 'app:app', '-c', 'gunicorn.conf.py',
+            '-b', f'127.0.0.1:{port}', '-w', str(args.workers), '--threads', str(args.threads),
+            '--timeout', '120'
+        ]
+    else:
+        # Werkzeug's threaded dev server, to try the harness without gunicorn
+        command = [sys.executable, '-c', (
+            "import logging; logging.getLogger('werkzeug').setLevel(logging.ERROR); "
+            f"from app import app; app.run(port={port}, threaded=True)"
+        )]
+    process = subprocess.Popen(command, cwd=ROOT, env=dict(os.environ, **env))
+
+    base_url = f'http://127.0.0.1:{port}'
+    deadline = time.time() + args.boot_timeout
+    while time.time() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"server exited with {process.returncode}")
+        try:
+            if requests.get(base_url + '/', timeout=2).status_code == 200:
+                return process, base_url
+        except requests.RequestException:
+            pass
+        time.sleep(0.5)
+    process.terminate()
+    raise RuntimeError(f"server not ready after {args.boot_timeout}s")
+
+class Recorder:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.samples = {}
+
+    def add(self, route, elapsed, ok):
+        with self._lock:
+            self.samples.setdefault(route, []).append((elapsed, ok))
+
+    def summary(self, duration):
+        results = {}
+        everything = []
+        for route, samples in sorted(self.samples.items()):
+            results[route] = _summarize(samples, duration)
+            everything.extend(samples)
+        results['all'] = _summarize(everything, duration)
+        return results
+
+def _summarize(samples, duration):
+    latencies = [elapsed for elapsed, _ in samples]
+    errors = sum(1 for _, ok in samples if not ok)
+    return {
+        "requests": len(samples),
+        "errors": errors,
+        "error_rate": round(errors / len(samples), 4) if samples else 0,
+        "throughput_rps": round(len(samples) / duration, 2),
+        "p50_ms": round(percentile(latencies, 50) * 1000, 2) if samples else None,
+        "p95_ms": round(percentile(latencies, 95) * 1000, 2) if samples else None,
+        "p99_ms": round(percentile(latencies, 99) * 1000, 2) if samples else None,
+        "max_ms": round(max(latencies) * 1000, 2) if samples else None
+    }
+
+class VirtualUser(threading.Thread):
+    def __init__(self, user_id, base_url, names, recorder, stop, args, rng):
+        super().__init__(daemon=True)
+        self.user_id = user_id
+        self.base_url = base_url
+        self.names = names
+        self.recorder = recorder
+        self.stop = stop
+        self.args = args
+        self.rng = rng
+        self.session = requests.Session()
+        self.etags = {}
+
+    def request(self, route, path, method='GET', revalidate=True, **kwargs):
+        url = self.base_url + path
+        headers = kwargs.pop('headers', {})
+        if revalidate and url in self.etags:
+            headers['If-None-Match'] = self.etags[url]
+        start = time.perf_counter()
+        try:
+            response = self.session.request(method, url, headers=headers, timeout=REQUEST_TIMEOUT, **kwargs)
+            response.content
+            ok = response.status_code < 400
+        except requests.RequestException:
+            response = None
+            ok = False
+        self.recorder.add(route, time.perf_counter() - start, ok)
+        if response is not None and response.headers.get('ETag'):
+            self.etags[url] = response.headers['ETag']
+        return response
+
+    def login(self):
+        if self.rng.random() < self.args.google_share:
+            # /google-login -> stub /authorize -> /auth/callback -> /report
+            response = self.request('/google-login', '/google-login', allow_redirects=False, revalidate=False)
+            if response is None:
+                return False
+            authorize = response.headers.get('Location', '')
+            separator = '&' if '?' in authorize else '?'
+            response = requests.get(authorize + separator + urlencode({'login_hint': f'g{self.user_id}'}),
+                                    allow_redirects=False, timeout=REQUEST_TIMEOUT)
+            callback = urlsplit(response.headers.get('Location', ''))
+            response = self.request('/auth/callback', f'{callback.path}?{callback.query}', allow_redirects=False, revalidate=False)
+            return response is not None and response.headers.get('Location', '').endswith('/report')
+        response = self.request('/login', '/login', method='POST', revalidate=False,
+                                json={'email': f'user{self.user_id}@loadtest', 'password': PASSWORD})
+        return response is not None and response.status_code == 200
+
+    def view_report(self):
+        name = self.rng.choice(self.names)
+        self.request('/report', '/report?' + urlencode({'name': name}))
+        for fragment in REPORT_FRAGMENTS:
+            self.request(f'/api/report/<name>/{fragment}', f'/api/report/{quote(name)}/{fragment}')
+
+    def view_mayors(self):
+        self.request('/mayors', '/mayors')
+
+    def view_all_posts(self):
+        self.request('/all-posts', '/all-posts')
+        self.request('/api/all-posts (full)', '/api/all-posts', headers={'Accept-Encoding': 'br, gzip'})
+
+    def view_all_posts_page(self):
+        column = self.rng.randrange(len(SORT_COLUMNS))
+        query = {
+            'draw': 1,
+            'start': self.rng.choice([0, 0, 0, 25, 50, 100]),
+            'length': 25,
+            'order[0][column]': column,
+            'order[0][dir]': self.rng.choice(['asc', 'desc']),
+            f'columns[{column}][data]': SORT_COLUMNS[column]
+        }
+        self.request('/api/all-posts (page)', '/api/all-posts?' + urlencode(query))
+
+    def run(self):
+        if not self.login():
+            return
+        actions = list(WORKLOAD)
+        weights = [WORKLOAD[action] for action in actions]
+        while not self.stop.is_set():
+            action = self.rng.choices(actions, weights)[0]
+            getattr(self, 'view_' + action)()
+            if self.args.think:
+                self.stop.wait(self.rng.expovariate(1000 / self.args.think))
+
+def run_step(concurrency, base_url, names, args, seed):
+    recorder = Recorder()
+    stop = threading.Event()
+    users = [
+        VirtualUser(i, base_url, names, recorder, stop, args, random.Random(seed * 1000 + i))
+        for i in range(concurrency)
+    ]
+    start = time.perf_counter()
+    for user in users:
+        user.start()
+    time.sleep(args.duration)
+    stop.set()
+    for user in users:
+        user.join(REQUEST_TIMEOUT)
+    return recorder.summary(time.perf_counter() - start)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--data-dir', help='Existing data directory (otherwise one is generated)')
+    parser.add_argument('--profiles', type=int, default=81)
+    parser.add_argument('--posts', type=int, default=90)
+    parser.add_argument('--server', choices=['gunicorn', 'flask'], default='gunicorn')
+    parser.add_argument('--workers', type=int, default=2, help='gunicorn worker processes')
+    parser.add_argument('--threads', type=int, default=4, help='Threads per gunicorn worker')
+    parser.add_argument('--steps', default='1,5,10,25', help='Comma-separated concurrency levels')
+    parser.add_argument('--duration', type=float, default=30, help='Seconds per step')
+    parser.add_argument('--think', type=float, default=500, help='Mean think time between actions, ms (0 for none)')
+    parser.add_argument('--google-share', type=float, default=0.2, help='Share of users logging in through Google')
+    parser.add_argument('--boot-timeout', type=float, default=120)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help='Result file (default: bench/loadtest-<commit>.json)')
+    parser.add_argument('--baseline', help='Earlier result file to compare against')
+    parser.add_argument('--keep', action='store_true', help='Keep the work directory (data, users.db, caches)')
+    args = parser.parse_args()
+    steps = [int(step) for step in args.steps.split(',')]
+
+    workdir = tempfile.mkdtemp(prefix='pacific-load-')
+    data_dir = args.data_dir
+    if not data_dir:
+        data_dir = os.path.join(workdir, 'Datas')
+        generate_data.generate(data_dir, args.profiles, args.posts)
+
+    oauth = OAuthStub()
+    threading.Thread(target=oauth.serve_forever, daemon=True).start()
+    env = {
+        'DATA_DIR': os.path.abspath(data_dir),
+        'SNAPSHOT_PATH': os.path.join(workdir, 'snapshot.bin'),
+        'OG_IMAGE_CACHE': os.path.join(workdir, 'og_images.db'),
+        'THUMBNAIL_CACHE': os.path.join(workdir, 'thumbnails'),
+        'FOLLOWER_STORE': os.path.join(workdir, 'followers.bin'),
+        'EXPORT_DIR': os.path.join(workdir, 'exports'),
+        'PRECOMPUTE_DIR': os.path.join(workdir, 'precompute'),
+        'DATABASE_URL': 'sqlite:///' + os.path.join(workdir, 'users.db'),
+        'SECRET_KEY': 'loadtest',
+        'GOOGLE_CLIENT_ID': 'loadtest',
+        'GOOGLE_CLIENT_SECRET': 'loadtest',
+        'GOOGLE_METADATA_URL': oauth.metadata_url,
+        'AUTHLIB_INSECURE_TRANSPORT': '1'
+    }
+    print("Seeding users and caching post images...")
+    names = prepare_app(env, max(steps))
+
+    port = free_port()
+    process, base_url = start_server(args, env, port)
+    print(f"{args.server} listening on {base_url}")
+
+    results = {}
+    try:
+        for i, concurrency in enumerate(steps):
+            summary = run_step(concurrency, base_url, names, args, args.seed + i)
+            results[str(concurrency)] = summary
+            print(f"\n{concurrency} users:")
+            for route, stats in summary.items():
+                print(f"  {route:<34} {stats['throughput_rps']:>8.1f} req/s   p50 {stats['p50_ms'] or 0:>8.1f}"
+                      f"   p95 {stats['p95_ms'] or 0:>8.1f}   p99 {stats['p99_ms'] or 0:>8.1f} ms"
+                      f"   errors {stats['error_rate']:.2%}")
+    finally:
+        process.terminate()
+        try:
+            process.wait(30)
+        except subprocess.TimeoutExpired:
+            process.kill()
+        oauth.shutdown()
+
+    commit = git_commit()
+    report = {
+        "meta": {
+            "commit": commit,
+            "timestamp": time.strftime('%Y-%m-%dT%H:%M:%S'),
+            "python": platform.python_version(),
+            "cpus": os.cpu_count(),
+            "server": args.server,
+            "workers": args.workers,
+            "threads": args.threads,
+            "data_dir": data_dir,
+            "profiles": len(names),
+            "duration_s": args.duration,
+            "think_ms": args.think,
+            "google_share": args.google_share,
+            "workload": WORKLOAD
+        },
+        "steps": results
+    }
+    output = args.output or os.path.join(ROOT, 'bench', f'loadtest-{commit}.json')
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"\nResults written to {output}")
+
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as f:
+            baseline = json.load(f)['steps']
+        print(f"\nCompared with {args.baseline} (p99, >1 is slower):")
+        for step, summary in results.items():
+            for route, stats in summary.items():
+                before = baseline.get(step, {}).get(route)
+                if before and before['p99_ms'] and stats['p99_ms']:
+                    print(f"  {step:>4} users  {route:<34} x{stats['p99_ms'] / before['p99_ms']:.2f}")
+
+    if not args.keep:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,184 @@
+"""
+Times the analiz functions and the Flask routes against a synthetic Datas/
+directory and writes the results as JSON.
+
+    python bench/run_benchmarks.py --profiles 81 --posts 90
+    python bench/run_benchmarks.py --data-dir /tmp/bench-big --baseline bench/results-abc1234.json
+
+Every benchmark reports a cold run (every cache reset, data read from disk)
+and the median/p95 of the warm runs after it. og:image fetches and
+image downloads are stubbed. The snapshot (--snapshot) and the follower
+history are inputs, not caches, so cold runs still read them.
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import tempfile
+import argparse
+import platform
+import subprocess
+import statistics
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import generate_data
+
+def git_commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, text=True).strip()
+    except Exception:
+        return 'unknown'
+
+def percentile(values, pct):
+    values = sorted(values)
+    index = min(len(values) - 1, int(round(pct / 100 * (len(values) - 1))))
+    return values[index]
+
+def measure(fn, repeat, reset):
+    reset()
+    start = time.perf_counter()
+    fn()
+    cold = time.perf_counter() - start
+
+    warm = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        warm.append(time.perf_counter() - start)
+    return {
+        "cold_ms": round(cold * 1000, 3),
+        "warm_median_ms": round(statistics.median(warm) * 1000, 3),
+        "warm_p95_ms": round(percentile(warm, 95) * 1000, 3),
+        "warm_min_ms": round(min(warm) * 1000, 3),
+        "runs": repeat
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--data-dir', help='Existing data directory (otherwise one is generated)')
+    parser.add_argument('--profiles', type=int, default=81)
+    parser.add_argument('--posts', type=int, default=90)
+    parser.add_argument('--repeat', type=int, default=20)
+    parser.add_argument('--snapshot', action='store_true', help='Build and use the binary snapshot')
+    parser.add_argument('--compress', choices=['zip', 'gz'], help='Generate the profiles as Datas.zip or *.csv.gz')
+    parser.add_argument('--output', help='Result file (default: bench/results-<commit>.json)')
+    parser.add_argument('--baseline', help='Earlier result file to compare against')
+    parser.add_argument('--keep', action='store_true', help='Keep the generated data directory')
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='pacific-bench-')
+    data_dir = args.data_dir
+    if not data_dir:
+        data_dir = os.path.join(workdir, 'Datas')
+        generate_data.generate(data_dir, args.profiles, args.posts, compress=args.compress)
+
+    # Point the app at the benchmark data before importing it
+    os.environ['DATA_DIR'] = data_dir
+    os.environ['SNAPSHOT_PATH'] = os.path.join(workdir, 'snapshot.bin') if args.snapshot else ''
+    os.environ['OG_IMAGE_CACHE'] = os.path.join(workdir, 'og_images.db')
+    os.environ['THUMBNAIL_CACHE'] = os.path.join(workdir, 'thumbnails')
+    os.environ['FOLLOWER_STORE'] = os.path.join(workdir, 'followers.bin')
+    os.environ['EXPORT_DIR'] = os.path.join(workdir, 'exports')
+    os.environ['PRECOMPUTE_DIR'] = os.path.join(workdir, 'precompute')
+    os.environ['DATABASE_URL'] = 'sqlite://'
+
+    import app as webapp
+    from utils import analiz, og_image, thumbnails, followers, anomalies, archive
+
+    og_image.fetch_og_image = lambda link: "https://example.invalid/stub.jpg"
+    thumbnails.download_image = lambda url: generate_data.stub_image()
+    webapp.app.config['LOGIN_DISABLED'] = True
+    client = webapp.app.test_client()
+
+    if args.snapshot:
+        analiz.build_snapshot(os.environ['SNAPSHOT_PATH'])
+
+    def reset():
+        # Drop every cache so the cold run reads from disk again: parsed frames,
+        # derived results, anomaly scores, memoized responses, the zip member
+        # index and the og:image and thumbnail caches on disk
+        analiz._store = analiz.PostStore(analiz.DATA_DIR, analiz.SNAPSHOT_PATH)
+        analiz._registry = analiz.ProfileRegistry(analiz.TAGS_PATH)
+        analiz._followers = followers.load_store()
+        analiz._anomaly_detector = anomalies.AnomalyDetector()
+        analiz._derived.clear()
+        archive._indexes.clear()
+        webapp._response_cache.clear()
+        if os.path.exists(og_image.CACHE_PATH):
+            os.remove(og_image.CACHE_PATH)
+        shutil.rmtree(thumbnails.CACHE_DIR, ignore_errors=True)
+
+    def get(url):
+        def run():
+            response = client.get(url)
+            response.get_data()
+            assert response.status_code == 200, (url, response.status_code)
+        return run
+
+    names = analiz.get_all_names()
+    name = names[len(names) // 2]
+    quoted = name.replace(' ', '%20')
+    sample_df = analiz.get_store().get(name)
+
+    benchmarks = {
+        "analiz.get_all_names": analiz.get_all_names,
+        "analiz.analyze_data": lambda: analiz.analyze_data(name),
+        "analiz.get_mayors_data": analiz.get_mayors_data,
+        "analiz.get_all_posts_data": analiz.get_all_posts_data,
+        "analiz.prepare_chart_data": lambda: analiz.prepare_chart_data(sample_df.copy()),
+        "route /report": get(f"/report?name={quoted}"),
+        "route /api/report/<name>/kpi": get(f"/api/report/{quoted}/kpi"),
+        "route /api/report/<name>/charts": get(f"/api/report/{quoted}/charts"),
+        "route /api/report/<name>/top-posts": get(f"/api/report/{quoted}/top-posts"),
+        "route /api/report/<name>/followers": get(f"/api/report/{quoted}/followers"),
+        "route /mayors": get("/mayors"),
+        "route /all-posts": get("/all-posts"),
+        "route /api/all-posts (full)": get("/api/all-posts"),
+        "route /api/all-posts (page)": get("/api/all-posts?draw=1&start=0&length=25&order[0][column]=2&order[0][dir]=desc&columns[2][data]=reach_rate"),
+        "route /api/anomalies": get("/api/anomalies?kind=viral"),
+    }
+
+    results = {}
+    for label, fn in benchmarks.items():
+        results[label] = measure(fn, args.repeat, reset)
+        print(f"{label:<40} cold {results[label]['cold_ms']:>10.2f} ms   warm p50 {results[label]['warm_median_ms']:>9.2f} ms")
+
+    commit = git_commit()
+    report = {
+        "meta": {
+            "commit": commit,
+            "timestamp": time.strftime('%Y-%m-%dT%H:%M:%S'),
+            "python": platform.python_version(),
+            "data_dir": data_dir,
+            "profiles": len(names),
+            "posts": sum(len(df) for _, df in analiz.get_store().items()),
+            "snapshot": args.snapshot,
+            "compress": args.compress,
+            "repeat": args.repeat
+        },
+        "results": results
+    }
+
+    output = args.output or os.path.join(ROOT, 'bench', f'results-{commit}.json')
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"Results written to {output}")
+
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as f:
+            baseline = json.load(f)['results']
+        print(f"\nCompared with {args.baseline} (warm p50, >1 is slower):")
+        for label, result in results.items():
+            if label in baseline and baseline[label]['warm_median_ms']:
+                ratio = result['warm_median_ms'] / baseline[label]['warm_median_ms']
+                print(f"{label:<40} x{ratio:.2f}")
+
+    if not args.keep:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+if __name__ == '__main__':
+    main()
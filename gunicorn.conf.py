@@ -0,0 +1,35 @@
+# gunicorn -c gunicorn.conf.py app:app
+import os
+
+# Import the app in the master so the warmed caches are shared by every worker
+preload_app = True
+
+# Request threads per worker. Password hashing and precompute builds run off
+# these threads, so a burst of logins does not hold up the dashboard routes.
+threads = int(os.environ.get('GUNICORN_THREADS', '4'))
+
+# Workers share their metrics through this directory so /metrics adds them up
+os.environ.setdefault('METRICS_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'instance', 'metrics'))
+
+def when_ready(server):
+    # The sockets are bound by now, so these boot steps do not count against
+    # the platform's port binding timeout; workers fork once they are done
+    from utils import analiz, metrics, precompute
+    metrics.clear_shared()
+    try:
+        if analiz.SNAPSHOT_PATH:
+            analiz.build_snapshot()
+        # Replays every file in Datas/ (older drops in Datas.zip too) into the
+        # follower history, which does not survive restarts on ephemeral disks
+        analiz.backfill_followers()
+    except Exception as e:
+        print(f"Error preparing Datas/: {e}")
+    # Parse Datas/ and build the derived caches once, before any worker forks
+    precompute.warm()
+
+def post_fork(server, worker):
+    # Each worker keeps its caches current in the background; one builds a
+    # new data version, the others load its results from instance/precompute/
+    from utils import metrics, precompute
+    metrics.start_sharing()
+    precompute.start()
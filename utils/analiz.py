@@ -1,148 +1,1201 @@
+import io
 import os
 import pandas as pd
+import numpy as np
 import glob
 import math
-import requests
-from bs4 import BeautifulSoup
+import time
+import heapq
+import hashlib
+import warnings
+import threading
+import unicodedata
+from collections import OrderedDict
+from datetime import datetime, timezone
+from utils import og_image
+from utils import snapshot
+from utils import metrics
+from utils import search
+from utils import thumbnails
+from utils import archive
+from utils import followers
+from utils import anomalies
 
-DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'data')
+DATA_DIR = os.environ.get('DATA_DIR', os.path.join(os.path.dirname(os.path.dirname(__file__)), 'Datas'))
+TAGS_PATH = os.path.join(DATA_DIR, 'profile_tags.csv')
+SNAPSHOT_PATH = os.environ.get('SNAPSHOT_PATH', os.path.join(DATA_DIR, '.snapshot.bin'))
 
-def get_all_names():
+NUMERIC_COLUMNS = ['BeğeniSayısı', 'YorumSayısı', 'Takipçi']
+# Seconds between two scans of the data directory for changed files
+CHECK_INTERVAL = float(os.environ.get('DATA_CHECK_INTERVAL', 1.0))
+# Numeric columns stored as float64 in the snapshot, the rest are text
+SNAPSHOT_NUMERIC_COLUMNS = NUMERIC_COLUMNS + ['Görüntülenme Sayısı', 'TahminMi']
+
+# Known *Main.csv columns and their types; numbers are parsed straight to float64
+CSV_SCHEMA = {
+    'PostLink': str,
+    'PostTürü': str,
+    'BeğeniSayısı': np.float64,
+    'YorumSayısı': np.float64,
+    'Görüntülenme Sayısı': np.float64,
+    'Tarih': str,
+    'DisplayPhoto': str,
+    'Caption': str,
+    'Takipçi': np.float64,
+    'TahminMi': np.float64
+}
+# Long columns only a few requests need: read per profile on demand instead of kept in the store
+LAZY_COLUMNS = ['DisplayPhoto', 'Caption']
+STORE_COLUMNS = [col for col in CSV_SCHEMA if col not in LAZY_COLUMNS]
+LAZY_CACHE_SIZE = 32
+# The C parser wins on files of a few hundred rows; CSV_ENGINE=pyarrow
+# (multithreaded) only pays off for very large exports
+CSV_ENGINE = os.environ.get('CSV_ENGINE', 'c')
+
+def file_fingerprint(path):
+    """
+    Returns (mtime_ns, size) for a file, or None if it does not exist.
+    """
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return (st.st_mtime_ns, st.st_size)
+
+def scan_profiles(data_dir):
     """
-    Scans the data directory for files ending with 'Main.csv'
-    and extracts the names (e.g., 'Adem Uzun' from 'Adem UzunMain.csv').
+    Returns {name: (path, fingerprint)} for every profile in data_dir:
+    *Main.csv files, *Main.csv.gz files and *Main.csv members of *.zip
+    archives. Loose files win over compressed ones, so a single profile
+    can be patched without rebuilding the archive.
     """
-    files = glob.glob(os.path.join(DATA_DIR, '*Main.csv'))
-    names = []
-    for f in files:
-        basename = os.path.basename(f)
-        name = basename.replace('Main.csv', '')
-        names.append(name)
-    return names
+    found = {}
+    for archive_path in sorted(glob.glob(os.path.join(data_dir, '*.zip'))):
+        found.update(archive.members(archive_path))
+    for suffix in ('Main.csv.gz', 'Main.csv'):
+        for path in glob.glob(os.path.join(data_dir, '*' + suffix)):
+            fingerprint = file_fingerprint(path)
+            if fingerprint is None:
+                continue
+            name = unicodedata.normalize('NFC', os.path.basename(path)[:-len(suffix)])
+            found[name] = (path, fingerprint)
+    return found
 
-def get_city_map():
+def get_dataset_version():
     """
-    Reads profile_tags.csv and returns a dictionary mapping names to cities (Tag3).
+    Returns (version, last_modified) computed from file fingerprints only.
+    Nothing is parsed, and every worker process gets the same answer,
+    so it is safe to use for ETags.
     """
-    tags_path = os.path.join(DATA_DIR, 'profile_tags.csv')
-    city_map = {}
-    if os.path.exists(tags_path):
+    fingerprints = sorted((name, fp) for name, (_, fp) in scan_profiles(DATA_DIR).items())
+    tags_fingerprint = file_fingerprint(TAGS_PATH)
+    digest = hashlib.sha1(repr((fingerprints, tags_fingerprint)).encode('utf-8')).hexdigest()
+
+    mtimes = [fp[0] for _, fp in fingerprints]
+    if tags_fingerprint is not None:
+        mtimes.append(tags_fingerprint[0])
+    last_modified = datetime.fromtimestamp(max(mtimes) / 1e9, tz=timezone.utc) if mtimes else None
+    return digest[:20], last_modified
+
+def read_csv_header(csv_path):
+    """
+    Returns {column: name as written in the file} for a *Main.csv header.
+    Columns are NFC-normalized with the BOM and whitespace stripped,
+    so they match CSV_SCHEMA however the file was saved.
+    """
+    with archive.open_binary(csv_path) as f:
+        header = f.readline().decode('utf-8-sig').rstrip('\r\n').split(';')
+    return {unicodedata.normalize('NFC', name.strip()): name for name in header}
+
+def _long_rows(data):
+    # Positions (as DataFrame rows) of records with more fields than the header.
+    # Separators and line breaks inside quotes (captions) do not count.
+    if not data:
+        return []
+    raw = np.frombuffer(data, dtype=np.uint8)
+    quotes = np.flatnonzero(raw == ord('"'))
+    line_breaks = np.flatnonzero(raw == ord('\n'))
+    separators = np.flatnonzero(raw == ord(';'))
+    if len(quotes):
+        line_breaks = line_breaks[np.searchsorted(quotes, line_breaks) % 2 == 0]
+        separators = separators[np.searchsorted(quotes, separators) % 2 == 0]
+    # Record i ends at line_breaks[i]; the last one runs to the end of the data
+    counts = np.bincount(np.searchsorted(line_breaks, separators), minlength=len(line_breaks) + 1)
+    starts = np.concatenate(([0], line_breaks + 1))
+    lengths = np.concatenate((line_breaks, [len(raw)])) - starts
+    # Blank lines produce no row in pandas
+    blank = (lengths == 0) | ((lengths == 1) & (raw[np.minimum(starts, len(raw) - 1)] == ord('\r')))
+    counts = counts[~blank]
+    if not len(counts):
+        return []
+    return np.flatnonzero(counts[1:] > counts[0]).tolist()
+
+def _parse_csv(csv_path, usecols, dtype):
+    # Returns (DataFrame, number of rows skipped because they had the wrong field count)
+    with archive.open_binary(csv_path) as f:
+        data = f.read()
+    with warnings.catch_warnings(record=True) as caught:
+        warnings.simplefilter('always', pd.errors.ParserWarning)
+        # Plain utf-8: both parsers skip the BOM themselves, while 'utf-8-sig'
+        # would push the C parser onto a much slower Python decoding path
+        df = pd.read_csv(
+            io.BytesIO(data), sep=';', encoding='utf-8', usecols=usecols, dtype=dtype,
+            engine=CSV_ENGINE, on_bad_lines='warn'
+        )
+    skipped = 0
+    for warning in caught:
+        if issubclass(warning.category, pd.errors.ParserWarning):
+            # The C parser reports many lines per warning, pyarrow one
+            skipped += max(1, str(warning.message).count('Skipping line'))
+        else:
+            warnings.warn(warning.message, warning.category)
+    if CSV_ENGINE != 'pyarrow':
+        # With usecols the C and Python parsers keep rows with extra fields
+        # and silently read their first columns; drop them as pyarrow does
+        long_rows = [row for row in _long_rows(data) if row < len(df)]
+        if long_rows:
+            df = df.drop(df.index[long_rows]).reset_index(drop=True)
+            skipped += len(long_rows)
+    return df, skipped
+
+def read_profile_csv(csv_path, columns=None):
+    """
+    Reads a single *Main.csv file (plain, .gz or a zip member) with the types of CSV_SCHEMA.
+    Only `columns` are parsed (default: STORE_COLUMNS); columns the file
+    lacks are left out. Rejected rows and unparseable numbers are reported
+    by full reads only, so lazy column reads do not count a file twice.
+    """
+    header = read_csv_header(csv_path)
+    wanted = [col for col in (columns or STORE_COLUMNS) if col in header]
+    usecols = [header[col] for col in wanted]
+    dtype = {header[col]: CSV_SCHEMA[col] for col in wanted if col in CSV_SCHEMA}
+
+    with metrics.span('csv_parse'):
         try:
-            # Read CSV with semicolon delimiter
-            df = pd.read_csv(tags_path, sep=';')
-            # Create a dictionary {Profil: Tag3}
-            # Strip whitespace just in case
-            for _, row in df.iterrows():
-                if pd.notna(row['Profil']) and pd.notna(row['Tag3']):
-                    city_map[row['Profil'].strip()] = row['Tag3'].strip()
-        except Exception as e:
-            print(f"Error reading profile_tags.csv: {e}")
-    return city_map
+            df, skipped = _parse_csv(csv_path, usecols, dtype)
+        except ValueError:
+            # Some numeric column holds text: read everything as text, coerce below
+            df, skipped = _parse_csv(csv_path, usecols, {col: str for col in usecols})
+    if list(df.columns) != wanted:
+        df = df.rename(columns={raw: col for col, raw in header.items() if raw in df.columns})[wanted]
 
-def get_region_map():
+    rejected = {}
+    bad_rows = None
+    with metrics.span('to_numeric'):
+        dtypes = df.dtypes
+        for col in wanted:
+            if CSV_SCHEMA.get(col) is np.float64 and dtypes[col] != np.float64:
+                values = pd.to_numeric(df[col], errors='coerce')
+                bad = values.isna() & df[col].notna()
+                count = int(bad.sum())
+                if count:
+                    rejected[col] = count
+                    bad_rows = bad if bad_rows is None else bad_rows | bad
+                df[col] = values.astype(np.float64)
+        missing = {col: 0 for col in NUMERIC_COLUMNS if col in df.columns}
+        if missing and df[list(missing)].isna().any().any():
+            df = df.fillna(missing)
+
+    if (skipped or rejected) and columns is None:
+        details = ', '.join(f"{count} bad {col} values" for col, count in rejected.items())
+        print(f"Warning reading {csv_path}: {skipped} malformed rows skipped" + (f", {details} treated as missing" if details else ""))
+        # Rows kept with a coerced number count as rejected too, so bad scrapes show up
+        metrics.increment('pacific_csv_rejected_rows_total', (('reason', 'malformed'),), skipped)
+        bad_number_rows = 0 if bad_rows is None else int(bad_rows.sum())
+        metrics.increment('pacific_csv_rejected_rows_total', (('reason', 'bad_number'),), bad_number_rows)
+    return df
+
+class PostStore:
     """
-    Reads profile_tags.csv and returns a dictionary mapping names to regions (Tag1).
+    Process-wide cache of parsed *Main.csv files.
+    Each profile is parsed once and kept together with an (mtime, size)
+    fingerprint of its file. refresh() only re-parses files whose
+    fingerprint changed and drops profiles whose file disappeared.
     """
-    tags_path = os.path.join(DATA_DIR, 'profile_tags.csv')
-    region_map = {}
-    if os.path.exists(tags_path):
+
+    def __init__(self, data_dir, snapshot_path=None):
+        self.data_dir = data_dir
+        self.snapshot_path = snapshot_path
+        self._snapshot = None
+        self._snapshot_checked = False
+        self._lock = threading.Lock()
+        self._frames = {}
+        self._fingerprints = {}
+        self._paths = {}
+        self._last_scan = None
+        # {(name, column): (fingerprint, Series)} for LAZY_COLUMNS, most recent last
+        self._lazy = OrderedDict()
+        # Off while a background precomputer refreshes the store
+        self.auto_refresh = True
+        # Bumped whenever a profile is added, re-parsed or removed
+        self.version = 0
+
+    def _scan(self):
+        return scan_profiles(self.data_dir)
+
+    def get_snapshot(self):
+        """
+        Returns the memory-mapped snapshot, opened on first use, or None.
+        """
+        if not self._snapshot_checked:
+            self._snapshot_checked = True
+            if self.snapshot_path:
+                self._snapshot = snapshot.load_snapshot(self.snapshot_path)
+        return self._snapshot
+
+    def _load(self, name, path, fingerprint):
+        # Prefer the snapshot, fall back to the CSV when it is stale
+        snap = self.get_snapshot()
+        if snap is not None:
+            with metrics.span('snapshot_load'):
+                df = snap.frame(name, fingerprint)
+            metrics.cache_event('snapshot', df is not None)
+            if df is not None:
+                return df
+        return read_profile_csv(path)
+
+    def refresh(self, force=False):
+        """
+        Brings the store in sync with the data directory.
+        The directory is scanned at most once per CHECK_INTERVAL seconds.
+        """
+        now = time.monotonic()
+        if not force and self._last_scan is not None:
+            if not self.auto_refresh or now - self._last_scan < CHECK_INTERVAL:
+                return
+        self._last_scan = now
+        found = self._scan()
+        with self._lock:
+            changed = False
+            for name in list(self._frames):
+                if name not in found:
+                    del self._frames[name]
+                    del self._fingerprints[name]
+                    self._paths.pop(name, None)
+                    changed = True
+
+            loaded = []
+            for name, (path, fingerprint) in found.items():
+                if self._fingerprints.get(name) == fingerprint:
+                    metrics.cache_event('post_store', True)
+                    continue
+                metrics.cache_event('post_store', False)
+                changed = True
+                try:
+                    self._frames[name] = self._load(name, path, fingerprint)
+                    self._fingerprints[name] = fingerprint
+                    self._paths[name] = path
+                    loaded.append(name)
+                except Exception as e:
+                    print(f"Error loading {path}: {e}")
+                    self._frames.pop(name, None)
+                    self._fingerprints.pop(name, None)
+
+            if loaded:
+                self._record_followers(loaded)
+            if changed:
+                self.version += 1
+
+    def install(self, frames):
+        """
+        Takes over profiles parsed by another process (the precompute build):
+        {name: (path, fingerprint, DataFrame or a callable returning it)}.
+        Profiles missing from frames are dropped, unchanged ones keep their
+        frame, so only changed profiles are materialized.
+        """
+        with self._lock:
+            changed = False
+            for name in list(self._frames):
+                if name not in frames:
+                    del self._frames[name]
+                    del self._fingerprints[name]
+                    self._paths.pop(name, None)
+                    changed = True
+            for name, (path, fingerprint, frame) in frames.items():
+                if self._fingerprints.get(name) == fingerprint:
+                    continue
+                self._frames[name] = frame() if callable(frame) else frame
+                self._fingerprints[name] = fingerprint
+                self._paths[name] = path
+                changed = True
+            self._last_scan = time.monotonic()
+            if changed:
+                self.version += 1
+
+    def _record_followers(self, names):
+        # Every ingested file adds the follower count it was scraped with to the history
+        rows = []
+        for name in names:
+            df = self._frames[name]
+            timestamp = scrape_time(self._paths[name], self._fingerprints[name], df['Tarih'])
+            if len(df) and timestamp is not None:
+                rows.append((name, timestamp, df['Takipçi'].iloc[0]))
         try:
-            # Read CSV with semicolon delimiter
-            df = pd.read_csv(tags_path, sep=';')
-            # Create a dictionary {Profil: Tag1}
-            for _, row in df.iterrows():
-                if pd.notna(row['Profil']) and pd.notna(row['Tag1']):
-                    region_map[row['Profil'].strip()] = row['Tag1'].strip()
+            get_follower_store().record(rows)
         except Exception as e:
-            print(f"Error reading profile_tags.csv for regions: {e}")
-    return region_map
+            print(f"Error recording followers: {e}")
 
-def get_all_posts_data():
+    def names(self):
+        self.refresh()
+        with self._lock:
+            return sorted(self._frames)
+
+    def get(self, name):
+        """
+        Returns the cached DataFrame for a profile, or None.
+        The frame is shared: callers that add columns must copy it first.
+        """
+        self.refresh()
+        return self._frames.get(name)
+
+    def items(self):
+        """
+        Returns a list of (name, DataFrame) pairs sorted by name.
+        """
+        self.refresh()
+        with self._lock:
+            return sorted(self._frames.items())
+
+    def fingerprints(self):
+        self.refresh()
+        with self._lock:
+            return dict(self._fingerprints)
+
+    def versioned_items(self):
+        """
+        Returns a list of (name, fingerprint, DataFrame) sorted by name,
+        read together so each frame matches its fingerprint.
+        """
+        self.refresh()
+        with self._lock:
+            return [(name, self._fingerprints[name], self._frames[name]) for name in sorted(self._frames)]
+
+    def entries(self):
+        """
+        Returns a list of (name, path, fingerprint, DataFrame) sorted by name.
+        """
+        self.refresh()
+        with self._lock:
+            return [(name, self._paths[name], self._fingerprints[name], self._frames[name]) for name in sorted(self._frames)]
+
+    def column(self, name, column, cache=True):
+        """
+        Returns one column of a profile, including LAZY_COLUMNS that the
+        cached frame leaves out, or None. Rows line up with get(name).
+        Bulk readers pass cache=False so they do not evict the per-profile
+        columns of the report pages.
+        """
+        df = self.get(name)
+        if df is None:
+            return None
+        if column in df.columns:
+            return df[column]
+
+        with self._lock:
+            fingerprint = self._fingerprints.get(name)
+            path = self._paths.get(name)
+            cached = self._lazy.get((name, column))
+            if cached is not None and cached[0] == fingerprint:
+                self._lazy.move_to_end((name, column))
+                return cached[1]
+
+        try:
+            values = read_profile_csv(path, [column]).get(column)
+        except Exception as e:
+            print(f"Error loading {column} of {name}: {e}")
+            return None
+        if values is None or len(values) != len(df):
+            return None
+        if not cache:
+            return values
+
+        with self._lock:
+            self._lazy[(name, column)] = (fingerprint, values)
+            while len(self._lazy) > LAZY_CACHE_SIZE:
+                self._lazy.popitem(last=False)
+        return values
+
+_store = PostStore(DATA_DIR, SNAPSHOT_PATH)
+_followers = followers.load_store()
+
+def get_store():
+    return _store
+
+def get_follower_store():
+    return _followers
+
+def backfill_followers(data_dir=DATA_DIR):
     """
-    Aggregates posts from all mayors.
-    Returns a list of dictionaries.
+    Records the follower count of every profile file in data_dir, including
+    archive members that a newer loose file shadows. Returns the number of new records.
     """
-    names = get_all_names()
-    region_map = get_region_map()
-    city_map = get_city_map()
-    all_posts = []
+    sources = []
+    for archive_path in sorted(glob.glob(os.path.join(data_dir, '*.zip'))):
+        sources.extend(archive.members(archive_path).items())
+    for suffix in ('Main.csv.gz', 'Main.csv'):
+        for path in glob.glob(os.path.join(data_dir, '*' + suffix)):
+            fingerprint = file_fingerprint(path)
+            if fingerprint is not None:
+                name = unicodedata.normalize('NFC', os.path.basename(path)[:-len(suffix)])
+                sources.append((name, (path, fingerprint)))
 
-    for name in names:
-        csv_path = os.path.join(DATA_DIR, f"{name}Main.csv")
-        if not os.path.exists(csv_path):
+    rows = []
+    for name, (path, fingerprint) in sources:
+        try:
+            df = read_profile_csv(path, ['Takipçi', 'Tarih'])
+        except Exception as e:
+            print(f"Error reading followers from {path}: {e}")
             continue
+        timestamp = scrape_time(path, fingerprint, df['Tarih'])
+        if len(df) and timestamp is not None:
+            rows.append((name, timestamp, df['Takipçi'].iloc[0]))
+    return get_follower_store().record(rows)
+
+def scrape_time(path, fingerprint, dates):
+    """
+    Returns the unix time a profile file was scraped, or None if unknown:
+    the date_time the scraper stored for a zip member, otherwise the time
+    of the newest post. File mtimes change on every checkout, copy or
+    deploy, so they never date a follower count. A re-scraped loose file
+    without new posts repeats its time; the follower store then keeps the
+    newer count.
+    """
+    if archive.split_member_path(path)[0] is not None and fingerprint[0] > 0:
+        return int(fingerprint[0] // 10**9)
+    newest = parse_post_dates(dates).max() if len(dates) else pd.NaT
+    if not pd.isna(newest):
+        return int(newest.value // 10**9)
+    return None
+
+def post_followers(name, df, dates=None):
+    """
+    Returns the follower count at the time of each post of a profile, as an array
+    aligned with df, interpolated from the follower history. Posts without a
+    date, or profiles without history, use the count in the file.
+    """
+    current = df['Takipçi'].iloc[0] if len(df) else 0
+    series = get_follower_store().series(name)
+    if len(series.timestamps) < 2:
+        return np.full(len(df), float(current))
+    if dates is None:
+        dates = parse_post_dates(df['Tarih'])
+    times = dates.to_numpy(dtype='datetime64[ns]')
+    # Post times are naive local times; a few hours do not matter at this resolution
+    valid = ~np.isnat(times)
+    result = np.full(len(df), float(current))
+    result[valid] = series.at(times[valid].astype(np.int64) // 10**9)
+    return result
 
+def reach_rates(interaction, followers_at_post):
+    """
+    Reach rate of each post: interaction / followers at post time * 100, 0 without followers.
+    """
+    interaction = np.asarray(interaction, dtype=np.float64)
+    result = np.zeros(len(interaction))
+    np.divide(interaction, followers_at_post, out=result, where=followers_at_post > 0)
+    return result * 100
+
+def average_reach_rate(name, df):
+    """
+    Average reach rate of a profile's posts, each against the followers at post time.
+    """
+    if not len(df):
+        return 0
+    return float(reach_rates(df['BeğeniSayısı'] + df['YorumSayısı'], post_followers(name, df)).mean())
+
+def get_all_names():
+    """
+    Returns the names of all loaded profiles
+    (e.g., 'Adem Uzun' from 'Adem UzunMain.csv').
+    """
+    return get_store().names()
+
+def read_tags():
+    """
+    Returns profile_tags.csv as a DataFrame (from the snapshot when it is fresh),
+    or None if the file does not exist.
+    """
+    fingerprint = file_fingerprint(TAGS_PATH)
+    if fingerprint is None:
+        return None
+    snap = get_store().get_snapshot()
+    if snap is not None:
+        df = snap.tags(fingerprint)
+        if df is not None:
+            return df
+    # Read CSV with semicolon delimiter
+    return pd.read_csv(TAGS_PATH, sep=';')
+
+def build_snapshot(path=SNAPSHOT_PATH):
+    """
+    Compiles every *Main.csv plus profile_tags.csv into a snapshot file.
+    Always parses the CSVs, so the result never depends on an older snapshot.
+    """
+    store = PostStore(DATA_DIR)
+    fingerprints = store.fingerprints()
+    profiles = {name: (fingerprints[name], df) for name, df in store.items()}
+    tags = None
+    tags_fingerprint = file_fingerprint(TAGS_PATH)
+    if tags_fingerprint is not None:
+        tags = (tags_fingerprint, pd.read_csv(TAGS_PATH, sep=';'))
+    snapshot.write_snapshot(path, profiles, tags, SNAPSHOT_NUMERIC_COLUMNS)
+    return path
+
+def _clean_tag(value):
+    if value is None or pd.isna(value):
+        return None
+    value = str(value).strip()
+    return value or None
+
+class ProfileRegistry:
+    """
+    Tags of every profile from profile_tags.csv, parsed in a single pass:
+    region (Tag1), metro status (Tag2), city (Tag3) and Instagram handle (Tag4),
+    plus region -> profiles and city -> profiles indexes.
+    The file is re-read only when its (mtime, size) fingerprint changes;
+    get_registry() checks that, the lookups below never touch the disk.
+    """
+
+    def __init__(self, tags_path):
+        self.tags_path = tags_path
+        self._lock = threading.Lock()
+        self._fingerprint = None
+        self.version = 0
+        self.profiles = {}
+        self.region_map = {}
+        self.city_map = {}
+        self.by_region = {}
+        self.by_city = {}
+        self.regions = []
+        self.cities = []
+
+    def refresh(self):
+        fingerprint = file_fingerprint(self.tags_path)
+        if fingerprint == self._fingerprint:
+            return self
+        with self._lock:
+            if fingerprint == self._fingerprint:
+                return self
+
+            profiles = {}
+            if fingerprint is not None:
+                try:
+                    df = read_tags()
+                    columns = [df[col].tolist() if col in df.columns else [None] * len(df)
+                               for col in ('Profil', 'Tag1', 'Tag2', 'Tag3', 'Tag4')]
+                    for name, region, metro, city, handle in zip(*columns):
+                        name = _clean_tag(name)
+                        if name:
+                            profiles[name] = {
+                                "region": _clean_tag(region),
+                                "metro": _clean_tag(metro),
+                                "city": _clean_tag(city),
+                                "handle": _clean_tag(handle)
+                            }
+                except Exception as e:
+                    print(f"Error reading profile_tags.csv: {e}")
+
+            by_region = {}
+            by_city = {}
+            for name, tags in profiles.items():
+                if tags["region"]:
+                    by_region.setdefault(tags["region"], []).append(name)
+                if tags["city"]:
+                    by_city.setdefault(tags["city"], []).append(name)
+
+            # Swap everything in at once
+            self.profiles = profiles
+            self.region_map = {name: t["region"] for name, t in profiles.items() if t["region"]}
+            self.city_map = {name: t["city"] for name, t in profiles.items() if t["city"]}
+            self.by_region = by_region
+            self.by_city = by_city
+            self.regions = sorted(by_region)
+            self.cities = sorted(by_city)
+            self._fingerprint = fingerprint
+            self.version += 1
+        return self
+
+    def get(self, name):
+        """
+        Returns the tags dict of a profile, or None.
+        """
+        return self.profiles.get(name)
+
+    def region(self, name, default="Bilinmiyor"):
+        return self.region_map.get(name, default)
+
+    def city(self, name, default="Bilinmiyor"):
+        return self.city_map.get(name, default)
+
+    def all_regions(self):
+        return self.regions
+
+    def profiles_in_region(self, region):
+        return self.by_region.get(region, [])
+
+    def profiles_in_city(self, city):
+        return self.by_city.get(city, [])
+
+_registry = ProfileRegistry(TAGS_PATH)
+
+def get_registry():
+    return _registry.refresh()
+
+def get_city_map():
+    """
+    Returns a dictionary mapping names to cities (Tag3).
+    The dictionary is shared, do not modify it.
+    """
+    return get_registry().city_map
+
+def get_region_map():
+    """
+    Returns a dictionary mapping names to regions (Tag1).
+    The dictionary is shared, do not modify it.
+    """
+    return get_registry().region_map
+
+POST_FIELDS = ["mayor", "city", "reach_rate", "likes", "comments", "type", "link", "region", "anomaly"]
+SORTABLE_FIELDS = ["mayor", "city", "reach_rate", "likes", "comments", "type", "region"]
+NUMERIC_POST_FIELDS = ["reach_rate", "likes", "comments"]
+
+def build_posts_frame():
+    """
+    Combines the posts of all mayors into one DataFrame with the
+    columns in POST_FIELDS (one row per post).
+    """
+    registry = get_registry()
+    flags = get_anomalies_by_profile()
+    parts = []
+
+    for name, df in get_store().items():
         try:
-            df = pd.read_csv(csv_path, sep=';')
-            
-            # Ensure numeric columns
-            df['BeğeniSayısı'] = pd.to_numeric(df['BeğeniSayısı'], errors='coerce').fillna(0)
-            df['YorumSayısı'] = pd.to_numeric(df['YorumSayısı'], errors='coerce').fillna(0)
-            df['Takipçi'] = pd.to_numeric(df['Takipçi'], errors='coerce').fillna(0)
-            
-            followers = df['Takipçi'].iloc[0] if not df.empty else 0
-            region = region_map.get(name, "Bilinmiyor")
-            city = city_map.get(name, "Bilinmiyor")
-
-            for _, row in df.iterrows():
-                likes = row['BeğeniSayısı']
-                comments = row['YorumSayısı']
-                total_interaction = likes + comments
-                
-                # Calculate Reach Rate: (Likes + Comments) / Followers * 100
-                reach_rate = (total_interaction / followers * 100) if followers > 0 else 0
-                
-                post_link = str(row['PostLink']) if pd.notna(row['PostLink']) else ""
-                
-                all_posts.append({
-                    "mayor": name,
-                    "region": region,
-                    "city": city,
-                    "likes": int(likes),
-                    "comments": int(comments),
-                    "reach_rate": reach_rate,
-                    "type": row['PostTürü'] if pd.notna(row['PostTürü']) else "Bilinmiyor",
-                    "link": post_link
-                })
+            likes = df['BeğeniSayısı'].astype(int)
+            comments = df['YorumSayısı'].astype(int)
+
+            # Calculate Reach Rate: (Likes + Comments) / Followers at post time * 100
+            reach_rate = pd.Series(reach_rates(likes + comments, post_followers(name, df)), index=df.index)
 
+            parts.append(pd.DataFrame({
+                "mayor": name,
+                "city": registry.city(name),
+                "reach_rate": reach_rate.astype(float),
+                "likes": likes,
+                "comments": comments,
+                "type": df['PostTürü'].fillna("Bilinmiyor").astype(str),
+                "link": df['PostLink'].fillna("").astype(str),
+                "region": registry.region(name),
+                "anomaly": _anomaly_kinds(flags, name, len(df)),
+            }))
         except Exception as e:
             print(f"Error processing posts for {name}: {e}")
             continue
 
-    # Sort by Reach Rate descending by default
-    all_posts.sort(key=lambda x: x['reach_rate'], reverse=True)
-    return all_posts
+    if not parts:
+        return pd.DataFrame({field: [] for field in POST_FIELDS})
+    return pd.concat(parts, ignore_index=True)[POST_FIELDS]
+
+class PostIndex:
+    """
+    All posts plus precomputed sort orders, globally and per region.
+    A page request is answered by picking an order and slicing it.
+    """
+
+    def __init__(self, frame):
+        self.frame = frame
+        self.regions = sorted(frame['region'].unique().tolist())
+        region_values = frame['region'].to_numpy(dtype=object)
+
+        # Lowercased text the DataTables search box matches against
+        self._search_text = (
+            frame['mayor'] + ' ' + frame['city'] + ' ' + frame['type'] + ' ' + frame['region']
+        ).str.lower().to_numpy(dtype=object)
+
+        # Ascending, stable orders: {(region or None, field): positions}
+        self.orders = {}
+        for field in SORTABLE_FIELDS:
+            if field in NUMERIC_POST_FIELDS:
+                values = frame[field].to_numpy()
+            else:
+                values = frame[field].to_numpy(dtype=object)
+            order = np.argsort(values, kind='stable')
+            self.orders[(None, field)] = order
+            ordered_regions = region_values[order]
+            for region in self.regions:
+                self.orders[(region, field)] = order[ordered_regions == region]
+
+    def __len__(self):
+        return len(self.frame)
+
+    def _order_for(self, field, regions):
+        if regions is None or set(self.regions) <= set(regions):
+            return self.orders[(None, field)]
+        regions = [r for r in regions if r in self.regions]
+        if not regions:
+            return np.array([], dtype=np.intp)
+        if len(regions) == 1:
+            return self.orders[(regions[0], field)]
+        # Several regions: filter the global order, it stays sorted
+        order = self.orders[(None, field)]
+        mask = np.isin(self.frame['region'].to_numpy(dtype=object)[order], regions)
+        return order[mask]
+
+    def query(self, start=0, length=25, order_by="reach_rate", descending=True, search="", regions=None):
+        """
+        Returns (records_filtered, rows) for one page.
+        `length` of -1 returns every matching row.
+        `regions` of None means no region filter.
+        """
+        if order_by not in SORTABLE_FIELDS:
+            order_by = "reach_rate"
+        order = self._order_for(order_by, regions)
+        if descending:
+            order = order[::-1]
+
+        search = (search or "").strip().lower()
+        if search and len(order):
+            matches = np.fromiter((search in text for text in self._search_text[order]), dtype=bool, count=len(order))
+            order = order[matches]
+
+        records_filtered = len(order)
+        start = max(int(start), 0)
+        page = order[start:] if length < 0 else order[start:start + int(length)]
+        return records_filtered, self.frame.iloc[page].to_dict('records')
+
+    def iter_chunks(self, fields=POST_FIELDS, order_by="reach_rate", descending=True, chunk_size=1000):
+        """
+        Yields lists of row tuples (values in `fields` order), `chunk_size` rows
+        at a time, so callers can stream posts without building them all.
+        """
+        order = self.orders[(None, order_by)]
+        if descending:
+            order = order[::-1]
+        for i in range(0, len(order), chunk_size):
+            part = self.frame.iloc[order[i:i + chunk_size]]
+            yield list(zip(*(part[field].tolist() for field in fields)))
+
+_derived = {}
+_derived_lock = threading.RLock()
+# Set while a background precomputer keeps _derived up to date
+_serve_stale = False
+# get_dataset_version() of the data behind the installed results, see get_served_version()
+_installed_dataset = None
+# Per-thread staging dict used by build_all_derived()
+_local = threading.local()
+
+def get_data_version():
+    """
+    Returns a tuple that changes whenever a profile CSV or profile_tags.csv changes.
+    """
+    store = get_store()
+    store.refresh()
+    return (store.version, get_registry().version)
+
+def get_derived(key):
+    """
+    Returns the DERIVED_BUILDERS[key]() result, cached until the data version changes.
+    Used for everything computed from all profiles at once.
+    While background refresh is on, an outdated result is served as is
+    until the precomputer swaps in the new one.
+    """
+    staging = getattr(_local, 'staging', None)
+    if staging is not None:
+        # Building for the precomputer: always fresh, kept out of _derived until installed
+        if key not in staging:
+            with metrics.span(f'build_{key}'):
+                staging[key] = DERIVED_BUILDERS[key]()
+        return staging[key]
+
+    version = get_data_version()
+    with _derived_lock:
+        entry = _derived.get(key)
+        hit = entry is not None and entry[0] == version
+        metrics.cache_event(f'derived_{key}', hit)
+        if not hit and entry is not None and _serve_stale:
+            return entry[1]
+        if not hit:
+            build = DERIVED_BUILDERS[key]
+            with metrics.span(f'build_{key}'):
+                entry = (version, build())
+            _derived[key] = entry
+        return entry[1]
+
+def install_derived(results, dataset_version=None):
+    """
+    Swaps in precomputed {key: result} for the current data version at once.
+    dataset_version is the get_dataset_version() the results were built from.
+    """
+    global _installed_dataset
+    version = get_data_version()
+    with _derived_lock:
+        for key, value in results.items():
+            _derived[key] = (version, value)
+        if dataset_version is not None:
+            _installed_dataset = dataset_version
+
+def get_served_version():
+    """
+    Returns (version, last_modified) of the data requests are answered from.
+    That is get_dataset_version(), except while background refresh serves
+    the previous results: then it is the version they were built from, so
+    ETags and memoized bodies only move on once the new results are installed.
+    """
+    with _derived_lock:
+        installed = _installed_dataset
+    if _serve_stale and installed is not None:
+        return installed
+    return get_dataset_version()
+
+def build_all_derived():
+    """
+    Computes every derived result for the current data from scratch,
+    without touching what requests currently read. Returns {key: result}.
+    """
+    get_store().refresh(force=True)
+    get_registry()
+    _local.staging = {}
+    try:
+        for key in DERIVED_BUILDERS:
+            get_derived(key)
+        return _local.staging
+    finally:
+        _local.staging = None
+
+def warm():
+    """
+    Loads all profiles and builds every derived result, e.g. before forking workers.
+    Returns the dataset version they were built from.
+    """
+    dataset_version = get_dataset_version()
+    install_derived(build_all_derived(), dataset_version)
+    return dataset_version
+
+def set_background_refresh(enabled):
+    """
+    With background refresh on, requests neither rescan Datas/ nor rebuild
+    derived results; the precomputer does both and swaps results in.
+    """
+    global _serve_stale
+    _serve_stale = enabled
+    get_store().auto_refresh = not enabled
+
+def get_post_index():
+    """
+    Returns the PostIndex for the current data, rebuilding it only
+    when a profile CSV or profile_tags.csv changed.
+    """
+    return get_derived('post_index')
+
+RANKING_METRICS = ["reach_rate", "likes", "comments", "interaction"]
+
+class ProfilePosts:
+    """
+    One profile's posts as NumPy columns sorted by date, with each post's
+    percentile rank within the profile for every ranking metric.
+    """
+
+    def __init__(self, name, df):
+        # Followers come from the first row of the file, read them before sorting
+        dates = parse_post_dates(df['Tarih'])
+        followers_at_post = post_followers(name, df, dates)
+        order = np.argsort(dates.to_numpy(dtype='datetime64[ns]'), kind='stable')
+        df = df.iloc[order]
+
+        self.name = name
+        self.dates = dates.to_numpy(dtype='datetime64[ns]')[order]
+        # NaT sorts last: posts [0, dated) have a date
+        self.dated = int(np.count_nonzero(~np.isnat(self.dates)))
+        self.links = df['PostLink'].fillna("").astype(str).to_numpy(dtype=object)
+        self.types = df['PostTürü'].fillna("Bilinmiyor").astype(str).to_numpy(dtype=object)
+
+        likes = df['BeğeniSayısı'].to_numpy(dtype=np.float64)
+        comments = df['YorumSayısı'].to_numpy(dtype=np.float64)
+        interaction = likes + comments
+        reach_rate = reach_rates(interaction, followers_at_post[order])
+        self.values = {
+            "reach_rate": reach_rate,
+            "likes": likes,
+            "comments": comments,
+            "interaction": interaction
+        }
+        self.percentiles = {
+            metric: pd.Series(values).rank(pct=True).to_numpy() * 100 if len(values) else values
+            for metric, values in self.values.items()
+        }
+        self.type_names = sorted(set(self.types))
+
+    def date_range(self, since=None, until=None):
+        """
+        Returns the (lo, hi) positions of posts in [since, until).
+        Undated posts sort last and are excluded as soon as either bound is given.
+        """
+        if since is None and until is None:
+            return 0, len(self.dates)
+        dates = self.dates[:self.dated]
+        lo = 0 if since is None else int(np.searchsorted(dates, np.datetime64(since, 'ns'), side='left'))
+        hi = self.dated if until is None else int(np.searchsorted(dates, np.datetime64(until, 'ns'), side='left'))
+        return lo, max(lo, hi)
+
+    def record(self, i, metric, registry):
+        return {
+            "mayor": self.name,
+            "region": registry.region(self.name),
+            "city": registry.city(self.name),
+            "type": self.types[i],
+            "date": None if np.isnat(self.dates[i]) else str(pd.Timestamp(self.dates[i])),
+            "link": self.links[i],
+            "likes": int(self.values["likes"][i]),
+            "comments": int(self.values["comments"][i]),
+            "reach_rate": float(self.values["reach_rate"][i]),
+            "percentile": float(self.percentiles[metric][i])
+        }
+
+class PostRanking:
+    """
+    Top-k selection across profiles: argpartition inside each profile,
+    then a bounded heap over the per-profile candidates. Only k posts are
+    ever turned into dicts.
+    """
+
+    def __init__(self, frames):
+        self.profiles = {name: ProfilePosts(name, df) for name, df in frames}
+
+    def top(self, metric="reach_rate", k=50, profiles=None, post_type=None, since=None, until=None, by_percentile=False):
+        """
+        Returns the k best posts by `metric`, best first.
+        by_percentile ranks by each post's percentile within its own profile,
+        so small accounts compete with big ones on equal terms.
+        """
+        if metric not in RANKING_METRICS:
+            raise ValueError(f"Unknown metric: {metric}")
+        if k <= 0:
+            return []
+        registry = get_registry()
+        names = self.profiles.keys() if profiles is None else profiles
+        wanted_type = post_type.lower() if post_type else None
+
+        heap = []
+        for name in names:
+            posts = self.profiles.get(name)
+            if posts is None:
+                continue
+            lo, hi = posts.date_range(since, until)
+            if lo >= hi:
+                continue
+
+            positions = np.arange(lo, hi)
+            if wanted_type:
+                # "Reel" matches "Reels"
+                allowed = [t for t in posts.type_names if t.lower().startswith(wanted_type)]
+                if not allowed:
+                    continue
+                positions = positions[np.isin(posts.types[lo:hi], allowed)]
+                if not len(positions):
+                    continue
+
+            primary = (posts.percentiles if by_percentile else posts.values)[metric][positions]
+            secondary = posts.values[metric][positions]
+            if len(positions) > k:
+                best = np.argpartition(-primary, k - 1)[:k]
+            else:
+                best = np.arange(len(positions))
+
+            for j in best:
+                item = (float(primary[j]), float(secondary[j]), name, int(positions[j]))
+                if len(heap) < k:
+                    heapq.heappush(heap, item)
+                elif item > heap[0]:
+                    heapq.heapreplace(heap, item)
+
+        ranked = sorted(heap, reverse=True)
+        return [self.profiles[name].record(i, metric, registry) for _, _, name, i in ranked]
+
+def get_post_ranking():
+    """
+    Returns the PostRanking for the current data.
+    """
+    return get_derived('post_ranking')
+
+def get_top_posts(metric="reach_rate", k=50, region=None, post_type=None, since=None, until=None, by_percentile=False):
+    """
+    Returns the top k posts across all mayors, optionally limited to a region,
+    a post type and a date range.
+    """
+    profiles = get_registry().profiles_in_region(region) if region else None
+    return get_post_ranking().top(metric, k, profiles, post_type, since, until, by_percentile)
+
+class PostSearch:
+    """
+    Caption/hashtag search over all posts, with the post details needed
+    to answer a query kept as parallel arrays.
+    """
+
+    def __init__(self, frames):
+        registry = get_registry()
+        store = get_store()
+        parts = []
+        for name, df in frames:
+            interaction = df['BeğeniSayısı'] + df['YorumSayısı']
+            # Captions are a lazy column, read from the files only for this index
+            captions = store.column(name, 'Caption', cache=False)
+            if captions is None:
+                captions = pd.Series("", index=df.index)
+            parts.append(pd.DataFrame({
+                "mayor": name,
+                "region": registry.region(name),
+                "city": registry.city(name),
+                "type": df['PostTürü'].fillna("Bilinmiyor").astype(str),
+                "date": df['Tarih'].fillna("").astype(str),
+                "link": df['PostLink'].fillna("").astype(str),
+                "caption": captions.fillna("").astype(str),
+                "likes": df['BeğeniSayısı'].astype(int),
+                "comments": df['YorumSayısı'].astype(int),
+                "reach_rate": reach_rates(interaction, post_followers(name, df)),
+                "interaction": interaction
+            }))
+        self.posts = pd.concat(parts, ignore_index=True) if parts else pd.DataFrame(
+            columns=["mayor", "region", "city", "type", "date", "link", "caption",
+                     "likes", "comments", "reach_rate", "interaction"])
+        self.index = search.SearchIndex(
+            self.posts['caption'].tolist(), self.posts['mayor'].tolist(), self.posts['region'].tolist()
+        )
+        self.interaction = self.posts['interaction'].to_numpy(dtype=np.float64)
+        # Result dicts are built once here: pandas row access is too slow per query
+        columns = ["mayor", "region", "city", "type", "date", "link", "caption", "likes", "comments", "reach_rate"]
+        self.records = self.posts[columns].to_dict('records')
+
+    def query(self, q, limit=20):
+        """
+        Returns (total, posts, facets); posts are the `limit` matches with
+        the most interaction.
+        """
+        docs = self.index.match(q)
+        total = len(docs)
+        if total > limit:
+            best = docs[np.argpartition(-self.interaction[docs], limit - 1)[:limit]]
+        else:
+            best = docs
+        best = best[np.argsort(-self.interaction[best], kind='stable')]
+        posts = [self.records[i] for i in best]
+        return total, posts, self.index.facets(docs)
+
+def get_post_search():
+    """
+    Returns the PostSearch for the current data.
+    """
+    return get_derived('post_search')
+
+ANOMALY_FIELDS = ["mayor", "city", "region", "type", "date", "likes", "comments", "expected", "score", "kind", "link"]
+
+_anomaly_detector = anomalies.AnomalyDetector()
+
+def get_anomaly_detector():
+    return _anomaly_detector
+
+def _anomaly_arrays(df):
+    # (engagement, post types, timestamps) of one profile for anomalies.score_profiles()
+    engagement = (df['BeğeniSayısı'] + df['YorumSayısı']).to_numpy(dtype=np.float64)
+    post_types = df['PostTürü'].fillna("Bilinmiyor").astype(str).to_numpy(dtype=object)
+    timestamps = parse_post_dates(df['Tarih']).to_numpy(dtype='datetime64[ns]')
+    return engagement, post_types, timestamps
+
+def build_anomalies():
+    """
+    Returns {name: (scores, expected, kinds)} with one entry per post, in
+    the row order of the profile's frame. Profiles whose file did not
+    change keep their previous scores.
+    """
+    items = get_store().versioned_items()
+    frames = {name: df for name, _, df in items}
+    fingerprints = {name: fingerprint for name, fingerprint, _ in items}
+    with metrics.span('anomalies'):
+        return _anomaly_detector.update(fingerprints, lambda name: _anomaly_arrays(frames[name]))
+
+def get_anomalies_by_profile():
+    return get_derived('anomalies')
+
+def _anomaly_kinds(flags, name, length):
+    # "viral", "low" or "" per post of a profile
+    result = flags.get(name)
+    if result is None or len(result[2]) != length:
+        return ""
+    return result[2]
+
+def build_anomaly_list():
+    """
+    Every flagged post as one DataFrame with ANOMALY_FIELDS, most unusual first.
+    """
+    registry = get_registry()
+    store = get_store()
+    parts = []
+    for name, (scores, expected, kinds) in get_anomalies_by_profile().items():
+        flagged = np.flatnonzero(kinds != "")
+        df = store.get(name)
+        if not len(flagged) or df is None or len(df) != len(kinds):
+            continue
+        posts = df.iloc[flagged]
+        parts.append(pd.DataFrame({
+            "mayor": name,
+            "city": registry.city(name),
+            "region": registry.region(name),
+            "type": posts['PostTürü'].fillna("Bilinmiyor").astype(str).to_numpy(),
+            "date": posts['Tarih'].fillna("").astype(str).to_numpy(),
+            "likes": posts['BeğeniSayısı'].astype(int).to_numpy(),
+            "comments": posts['YorumSayısı'].astype(int).to_numpy(),
+            "expected": np.round(expected[flagged]).astype(int),
+            "score": np.round(scores[flagged], 2),
+            "kind": kinds[flagged],
+            "link": posts['PostLink'].fillna("").astype(str).to_numpy()
+        }))
+    if not parts:
+        return pd.DataFrame({field: [] for field in ANOMALY_FIELDS})
+    frame = pd.concat(parts, ignore_index=True)[ANOMALY_FIELDS]
+    order = np.argsort(-frame['score'].abs().to_numpy(), kind='stable')
+    return frame.iloc[order].reset_index(drop=True)
+
+def get_anomalies(mayor=None, kind=None, region=None, limit=100):
+    """
+    Returns (total, posts) of the flagged posts, optionally for one mayor,
+    one kind ("viral" or "low") and one region, most unusual first.
+    """
+    frame = get_derived('anomaly_list')
+    mask = np.ones(len(frame), dtype=bool)
+    if mayor:
+        mask &= (frame['mayor'] == mayor).to_numpy()
+    if kind:
+        mask &= (frame['kind'] == kind).to_numpy()
+    if region:
+        mask &= (frame['region'] == region).to_numpy()
+    matches = frame[mask]
+    return len(matches), matches.head(limit).to_dict('records')
+
+def get_all_posts_data():
+    """
+    Aggregates posts from all mayors.
+    Returns a list of dictionaries sorted by reach rate, descending.
+    """
+    index = get_post_index()
+    return index.query(length=-1)[1]
 
 def get_mayors_data():
     """
     Aggregates statistics for each mayor.
-    Returns a list of dictionaries.
+    Returns a list of dictionaries (shared, do not modify).
     """
-    names = get_all_names()
-    region_map = get_region_map()
-    city_map = get_city_map()
-    mayors_data = []
+    return get_derived('mayors_data')
 
-    for name in names:
-        csv_path = os.path.join(DATA_DIR, f"{name}Main.csv")
-        if not os.path.exists(csv_path):
-            continue
+def build_mayors_data():
+    registry = get_registry()
+    mayors_data = []
 
+    for name, df in get_store().items():
         try:
-            df = pd.read_csv(csv_path, sep=';')
-            
-            # Ensure numeric columns
-            df['BeğeniSayısı'] = pd.to_numeric(df['BeğeniSayısı'], errors='coerce').fillna(0)
-            df['YorumSayısı'] = pd.to_numeric(df['YorumSayısı'], errors='coerce').fillna(0)
-            df['Takipçi'] = pd.to_numeric(df['Takipçi'], errors='coerce').fillna(0)
-            
             total_posts = len(df)
             if total_posts == 0:
                 continue
 
-            followers = df['Takipçi'].iloc[0] if not df.empty else 0
-            region = region_map.get(name, "Bilinmiyor")
-            city = city_map.get(name, "Bilinmiyor")
+            region = registry.region(name)
+            city = registry.city(name)
             
             total_likes = df['BeğeniSayısı'].sum()
             total_comments = df['YorumSayısı'].sum()
@@ -154,8 +1207,8 @@ def get_mayors_data():
             # Avg Interaction per post
             avg_interaction = total_interaction / total_posts
             
-            # Avg Reach Rate: (Avg Interaction / Followers) * 100
-            avg_reach_rate = (avg_interaction / followers * 100) if followers > 0 else 0
+            # Avg Reach Rate: mean of (Interaction / Followers at post time) * 100
+            avg_reach_rate = average_reach_rate(name, df)
 
             mayors_data.append({
                 "mayor": name,
@@ -174,28 +1227,146 @@ def get_mayors_data():
     mayors_data.sort(key=lambda x: x['avg_reach_rate'], reverse=True)
     return mayors_data
 
-def analyze_data(name):
+DEFAULT_TREND_DAYS = 7
+MAX_TREND_DAYS = 3650
+
+class PostTimelines:
     """
-    Reads the CSV for the given name and calculates KPIs and Top Posts.
+    Posts of every profile sorted by timestamp, with cumulative sums of
+    likes, comments, reach rates and post counts. Any date window of a
+    profile is answered with two binary searches.
     """
-    csv_path = os.path.join(DATA_DIR, f"{name}Main.csv")
-    
-    if not os.path.exists(csv_path):
-        return None
 
-    try:
-        # Read CSV with semicolon delimiter
-        df = pd.read_csv(csv_path, sep=';')
-        
-        # Ensure numeric columns are actually numeric
-        df['BeğeniSayısı'] = pd.to_numeric(df['BeğeniSayısı'], errors='coerce').fillna(0)
-        df['YorumSayısı'] = pd.to_numeric(df['YorumSayısı'], errors='coerce').fillna(0)
-        df['Takipçi'] = pd.to_numeric(df['Takipçi'], errors='coerce').fillna(0)
+    def __init__(self, frame):
+        # frame columns: mayor, date (datetime), likes, comments, reach
+        frame = frame[frame['date'].notna()].sort_values(['mayor', 'date'], kind='stable')
+        self.timestamps = frame['date'].to_numpy(dtype='datetime64[ns]')
+        self.cum_likes = np.concatenate([[0], np.cumsum(frame['likes'].to_numpy(dtype=np.float64))])
+        self.cum_comments = np.concatenate([[0], np.cumsum(frame['comments'].to_numpy(dtype=np.float64))])
+        self.cum_reach = np.concatenate([[0], np.cumsum(frame['reach'].to_numpy(dtype=np.float64))])
+
+        # {name: (lo, hi)} position range of each profile
+        mayors = frame['mayor'].to_numpy(dtype=object)
+        self.bounds = {}
+        if len(mayors):
+            starts = np.flatnonzero(np.r_[True, mayors[1:] != mayors[:-1]])
+            stops = np.r_[starts[1:], len(mayors)]
+            for lo, hi in zip(starts, stops):
+                self.bounds[mayors[lo]] = (int(lo), int(hi))
+
+        self.latest = pd.Timestamp(self.timestamps.max()) if len(self.timestamps) else None
+
+    def window(self, name, start, end):
+        """
+        Returns post count, likes, comments and summed reach rates of a profile in [start, end).
+        """
+        lo, hi = self.bounds.get(name, (0, 0))
+        times = self.timestamps[lo:hi]
+        i = lo + int(np.searchsorted(times, np.datetime64(start, 'ns'), side='left'))
+        j = lo + int(np.searchsorted(times, np.datetime64(end, 'ns'), side='left'))
+        return {
+            "posts": j - i,
+            "likes": float(self.cum_likes[j] - self.cum_likes[i]),
+            "comments": float(self.cum_comments[j] - self.cum_comments[i]),
+            "reach": float(self.cum_reach[j] - self.cum_reach[i])
+        }
+
+def get_timelines():
+    """
+    Returns the PostTimelines for the current data.
+    """
+    return get_derived('timelines')
+
+def resolve_trend_window(days=None, start=None, end=None):
+    """
+    Returns the (start, end) of the current window as Timestamps.
+    A custom start/end wins; otherwise the last `days` days (1 to
+    MAX_TREND_DAYS) up to the newest post in the data (the data is a
+    scrape, not a live feed).
+    """
+    if start is not None and end is not None and start < end:
+        return pd.Timestamp(start), pd.Timestamp(end)
+    if days is None:
+        days = DEFAULT_TREND_DAYS
+    days = min(max(int(days), 1), MAX_TREND_DAYS)
+    latest = get_timelines().latest
+    if latest is None:
+        latest = pd.Timestamp.now()
+    end = latest.normalize() + pd.Timedelta(days=1)
+    return end - pd.Timedelta(days=days), end
+
+def _format_trend(current, previous):
+    # Returns (text, direction) for a period-over-period change
+    if not previous:
+        return "0", "up"
+    change = (current - previous) / previous * 100
+    return f"{change:+.2f}%", ("up" if change >= 0 else "down")
 
-        # Get City
-        city_map = get_city_map()
-        city = city_map.get(name, "Bilinmiyor")
+def compute_trends(name, start, end):
+    """
+    Compares [start, end) with the window of the same length right before it.
+    Returns {kpi: (trend text, direction)} for followers, interaction, reach and posts.
+    Reach is the average of each window's per-post reach rates, so every post
+    counts against the followers the profile had when it was published.
+    """
+    timelines = get_timelines()
+    length = end - start
+    current = timelines.window(name, start, end)
+    previous = timelines.window(name, start - length, start)
 
+    def averages(window):
+        posts = window["posts"]
+        if posts <= 0:
+            return 0, 0
+        return (window["likes"] + window["comments"]) / posts, window["reach"] / posts
+
+    current_interaction, current_reach = averages(current)
+    previous_interaction, previous_reach = averages(previous)
+
+    # Follower growth over the window, once there are two data drops to compare
+    history = get_follower_store().series(name)
+    if len(history.timestamps) >= 2:
+        previous_followers, current_followers = history.at(np.array([start.value, end.value]) // 10**9)
+        follower_trend = _format_trend(current_followers, previous_followers)
+    else:
+        follower_trend = ("0", "up")
+
+    return {
+        "followers": follower_trend,
+        "interaction": _format_trend(current_interaction, previous_interaction),
+        "reach": _format_trend(current_reach, previous_reach),
+        "posts": _format_trend(current["posts"], previous["posts"])
+    }
+
+def get_follower_history(name, granularity='daily', start=None, end=None):
+    """
+    Returns a profile's follower counts for the growth chart, downsampled to
+    `granularity` ('raw', 'daily' or 'weekly'), optionally within [start, end).
+    """
+    series = get_follower_store().series(name, granularity)
+    timestamps, values = series.window(
+        None if start is None else int(pd.Timestamp(start).value // 10**9),
+        None if end is None else int(pd.Timestamp(end).value // 10**9)
+    )
+    dates = [datetime.fromtimestamp(int(ts), tz=timezone.utc) for ts in timestamps]
+    return {
+        "granularity": granularity,
+        "dates": [d.strftime('%Y-%m-%d') for d in dates],
+        "labels": [f"{d.day} {MONTHS_TR[d.month]}" for d in dates],
+        "values": [int(v) for v in values]
+    }
+
+def get_profile_kpis(name, trend_days=None, trend_start=None, trend_end=None):
+    """
+    Calculates the KPI cards of a profile. Trends compare the last `trend_days`
+    days (or trend_start..trend_end) with the period right before it.
+    Returns {"kpi_data", "trend_window"}, or None if the profile is unknown.
+    """
+    df = get_store().get(name)
+    if df is None:
+        return None
+
+    try:
         # --- KPI Calculations ---
         
         # 1. Total Posts
@@ -205,79 +1376,105 @@ def analyze_data(name):
         followers = df['Takipçi'].iloc[0] if not df.empty else 0
         
         # 3. Total Interaction (Likes + Comments)
-        df['TotalInteraction'] = df['BeğeniSayısı'] + df['YorumSayısı']
-        total_interaction = df['TotalInteraction'].sum()
+        total_interaction = df['BeğeniSayısı'].sum() + df['YorumSayısı'].sum()
         
         # 4. Avg Interaction (Total Interaction / Total Posts)
         avg_interaction = total_interaction / total_posts if total_posts > 0 else 0
         
-        # 5. Avg Reach Rate (Avg Interaction / Followers)
+        # 5. Avg Reach Rate (Interaction / Followers at post time, averaged over posts)
         # Note: User formula: Ortalama Erişim Oranı = Ortalama Etkileşim / Takipçi Sayısı
-        avg_reach_rate = (avg_interaction / followers) * 100 if followers > 0 else 0
+        avg_reach_rate = average_reach_rate(name, df)
+
+        # 6. Period-over-period trends
+        with metrics.span('trends'):
+            window_start, window_end = resolve_trend_window(trend_days, trend_start, trend_end)
+            trends = compute_trends(name, window_start, window_end)
 
         # Formatting for UI
         kpi_data = {
             "followers": {
                 "title": "Takipçi Sayısı",
                 "value": f"{int(followers):,}".replace(",", "."),
-                "trend": "+12.03%", # Placeholder
-                "trend_direction": "up",
+                "trend": trends["followers"][0],
+                "trend_direction": trends["followers"][1],
                 "icon": "MingcuteStarFill.svg"
             },
             "interaction": {
                 "title": "Ort. Etkileşim Sayısı",
                 "value": f"{int(avg_interaction):,}".replace(",", "."),
-                "trend": "+5.2%", # Placeholder
-                "trend_direction": "up",
+                "trend": trends["interaction"][0],
+                "trend_direction": trends["interaction"][1],
                 "icon": "MingcuteThumbUp2Fill.svg"
             },
             "reach": {
                 "title": "Ort. Erişim Oranı",
                 "value": f"%{avg_reach_rate:.2f}",
-                "trend": "-1.5%", # Placeholder
-                "trend_direction": "down",
+                "trend": trends["reach"][0],
+                "trend_direction": trends["reach"][1],
                 "icon": "MingcuteUser2Fill.svg"
             },
             "posts": {
                 "title": "Toplam Gönderi Sayısı",
                 "value": str(total_posts),
-                "trend": "0",
-                "trend_direction": "up",
+                "trend": trends["posts"][0],
+                "trend_direction": trends["posts"][1],
                 "icon": "MingcutePhotoAlbumFill.svg"
             }
         }
 
-        # --- Top Posts ---
-        # Sort by Total Interaction descending and take top 4
-        top_posts_df = df.sort_values(by='TotalInteraction', ascending=False).head(4)
+        return {
+            "kpi_data": kpi_data,
+            "trend_window": {
+                "start": window_start.strftime('%Y-%m-%d'),
+                "end": (window_end - pd.Timedelta(days=1)).strftime('%Y-%m-%d')
+            }
+        }
+
+    except Exception as e:
+        print(f"Error calculating KPIs for {name}: {e}")
+        return None
+
+def get_profile_top_posts(name, limit=4, deadline=og_image.DEADLINE):
+    """
+    Returns the `limit` posts of a profile with the most interaction,
+    with their thumbnails. This waits at most `deadline` seconds on
+    Instagram for uncached images. Returns None if the profile is unknown.
+    """
+    df = get_store().get(name)
+    if df is None:
+        return None
+
+    try:
+        # Sort by Total Interaction descending and take the top ones
+        interaction = df['BeğeniSayısı'] + df['YorumSayısı']
+        top_posts_df = df.loc[interaction.sort_values(ascending=False).index[:limit]]
+        captions = get_store().column(name, 'Caption')
         
+        # Resolve all thumbnails at once (cached, fetched in parallel)
+        if thumbnails.available():
+            with metrics.span('thumbnails'):
+                posts = top_posts_df[top_posts_df['PostLink'].notna()]
+                display_photos = get_store().column(name, 'DisplayPhoto')
+                if display_photos is not None:
+                    photos = display_photos.loc[posts.index].fillna("")
+                else:
+                    photos = [""] * len(posts)
+                digests = thumbnails.resolve(zip(posts['PostLink'], photos), deadline=deadline)
+            images = {link: thumbnails.url(digest) for link, digest in digests.items()}
+        else:
+            with metrics.span('og_image'):
+                images = og_image.resolve_images(top_posts_df['PostLink'].dropna().tolist(), deadline=deadline)
+
         top_posts = []
-        for _, row in top_posts_df.iterrows():
+        for index, row in top_posts_df.iterrows():
             # Handle nan caption
-            caption = row['Caption']
+            caption = captions.loc[index] if captions is not None else ""
             if pd.isna(caption) or str(caption).lower() == 'nan':
                 caption = ""
-            
-            # Clean the link (remove query params) and ensure trailing slash
+
             post_link = row['PostLink']
             if pd.notna(post_link):
-                post_link = str(post_link)
-                if '?' in post_link:
-                    post_link = post_link.split('?')[0]
-                if not post_link.endswith('/'):
-                    post_link += '/'
-                
-                try:
-                    response = requests.get(post_link, timeout=10)
-                    soup = BeautifulSoup(response.content, "html.parser")
-                    meta_tag = soup.find("meta", property="og:image")
-                    if meta_tag:
-                        image_url = meta_tag["content"]
-                    else:
-                        image_url = ""
-                except Exception as e:
-                    print(f"Error fetching image for {post_link}: {e}")
-                    image_url = ""
+                image_url = images.get(og_image.normalize_post_link(post_link), "")
             else:
                 image_url = ""
 
@@ -289,85 +1486,225 @@ def analyze_data(name):
                 "date": row['Tarih'],
                 "link": row['PostLink']
             })
-
-        return {
-            "kpi_data": kpi_data,
-            "top_posts": top_posts,
-            "city": city,
-            "chart_data": prepare_chart_data(df)
-        }
+        return top_posts
 
     except Exception as e:
-        print(f"Error analyzing data for {name}: {e}")
+        print(f"Error finding top posts for {name}: {e}")
         return None
 
-def prepare_chart_data(df):
+def analyze_data(name, trend_days=None, trend_start=None, trend_end=None):
     """
-    Calculates data for the 4 requested charts.
+    Calculates everything the report page shows for the given name:
+    KPIs, Top Posts, city and chart data.
     """
-    try:
-        # Convert Date to datetime
-        df['Tarih'] = pd.to_datetime(df['Tarih'], errors='coerce')
-        
-        # --- Chart A: Daily Trend (Area Chart) ---
-        # Group by Date (YYYY-MM-DD) and calc Mean Likes
-        daily_likes = df.groupby(df['Tarih'].dt.date)['BeğeniSayısı'].mean()
-        # Sort by date
-        daily_likes = daily_likes.sort_index()
-        
-        # Format Date as "7 Kasım"
-        month_map = {
-            1: 'Ocak', 2: 'Şubat', 3: 'Mart', 4: 'Nisan', 5: 'Mayıs', 6: 'Haziran',
-            7: 'Temmuz', 8: 'Ağustos', 9: 'Eylül', 10: 'Ekim', 11: 'Kasım', 12: 'Aralık'
-        }
-        
-        def format_date_tr(d):
-            return f"{d.day} {month_map[d.month]}"
+    kpis = get_profile_kpis(name, trend_days, trend_start, trend_end)
+    if kpis is None:
+        return None
+    return {
+        "kpi_data": kpis["kpi_data"],
+        "top_posts": get_profile_top_posts(name) or [],
+        "city": get_registry().city(name),
+        "chart_data": get_chart_data(name),
+        "chart_comparison": get_chart_comparison(name),
+        "trend_window": kpis["trend_window"]
+    }
 
-        chart_a = {
-            "labels": [format_date_tr(d) for d in daily_likes.index],
-            "values": [int(round(v)) for v in daily_likes.values]
-        }
+MONTHS_TR = {
+    1: 'Ocak', 2: 'Şubat', 3: 'Mart', 4: 'Nisan', 5: 'Mayıs', 6: 'Haziran',
+    7: 'Temmuz', 8: 'Ağustos', 9: 'Eylül', 10: 'Ekim', 11: 'Kasım', 12: 'Aralık'
+}
+# Day names (Monday=0, Sunday=6)
+DAYS_TR = ['Pazartesi', 'Salı', 'Çarşamba', 'Perşembe', 'Cuma', 'Cumartesi', 'Pazar']
+# 4-hour intervals: 0-4, 4-8, 8-12, 12-16, 16-20, 20-24
+HOUR_BIN_LABELS = ['00-04:00', '04-08:00', '08-12:00', '12-16:00', '16-20:00', '20-24:00']
 
-        # --- Chart B: Post Type Distribution (Polar Area) ---
-        # Group by PostTürü and calc Mean Likes
-        type_likes = df.groupby('PostTürü')['BeğeniSayısı'].mean()
-        chart_b = {
-            "labels": type_likes.index.tolist(),
-            "values": [int(round(v)) for v in type_likes.values]
-        }
+def parse_post_dates(series):
+    """
+    Parses the Tarih column with its known formats instead of inferring one.
+    Scraped files use '%Y-%m-%d %H:%M:%S', older ones '%d.%m.%Y %H:%M'.
+    """
+    dates = pd.to_datetime(series, format='%Y-%m-%d %H:%M:%S', errors='coerce')
+    missing = dates.isna() & series.notna()
+    if missing.any():
+        dates[missing] = pd.to_datetime(series[missing], format='%d.%m.%Y %H:%M', errors='coerce')
+    return dates
+
+def _nested(series):
+    # {first index level: {second index level: value}} for a 2-level Series
+    result = {}
+    for (outer, inner), value in series.items():
+        result.setdefault(outer, {})[inner] = value
+    return result
 
-        # --- Chart C: Hourly Analysis (Bar Chart) ---
-        # Extract Hour, bin into 4-hour intervals
-        # 0-4, 4-8, 8-12, 12-16, 16-20, 20-24
-        bins = [0, 4, 8, 12, 16, 20, 24]
-        labels = ['00-04:00', '04-08:00', '08-12:00', '12-16:00', '16-20:00', '20-24:00']
-        df['Hour'] = df['Tarih'].dt.hour
-        df['HourBin'] = pd.cut(df['Hour'], bins=bins, labels=labels, right=False)
-        hourly_likes = df.groupby('HourBin')['BeğeniSayısı'].mean().fillna(0)
-        chart_c = {
-            "labels": labels,
-            "values": [int(round(hourly_likes.get(l, 0))) for l in labels]
+def _format_chart_data(daily, types, hours, days):
+    """
+    Turns {key: mean likes} dicts into the chart_a..chart_d structure of index.html.
+    """
+    daily_keys = sorted(daily)
+    type_keys = sorted(types)
+    return {
+        # Daily Trend (Area Chart), dates as "7 Kasım"
+        "chart_a": {
+            "labels": [f"{d.day} {MONTHS_TR[d.month]}" for d in daily_keys],
+            "values": [int(round(daily[d])) for d in daily_keys]
+        },
+        # Post Type Distribution (Polar Area)
+        "chart_b": {
+            "labels": type_keys,
+            "values": [int(round(types[t])) for t in type_keys]
+        },
+        # Hourly Analysis (Bar Chart)
+        "chart_c": {
+            "labels": HOUR_BIN_LABELS,
+            "values": [int(round(hours.get(i, 0))) for i in range(len(HOUR_BIN_LABELS))]
+        },
+        # Day of Week Analysis (Bar Chart)
+        "chart_d": {
+            "labels": DAYS_TR,
+            "values": [int(round(days.get(i, 0))) for i in range(7)]
         }
+    }
+
+class ChartAggregates:
+    """
+    Mean likes per day, post type, 4-hour bin and day of week for every
+    profile, computed with one grouped pass per chart over all posts.
+    Also holds region averages (each profile weighted equally).
+    """
+
+    def __init__(self, frame, region_map=None):
+        # frame columns: mayor, date (datetime), likes, type
+        dated = frame[frame['date'].notna()]
+        mayor = dated['mayor']
+        likes = dated['likes']
 
-        # --- Chart D: Day of Week Analysis (Bar Chart) ---
-        # Day names (Monday=0, Sunday=6)
-        days = ['Pazartesi', 'Salı', 'Çarşamba', 'Perşembe', 'Cuma', 'Cumartesi', 'Pazar']
-        df['DayOfWeek'] = df['Tarih'].dt.dayofweek
-        day_likes = df.groupby('DayOfWeek')['BeğeniSayısı'].mean()
-        # Ensure all days are present
-        chart_d = {
-            "labels": days,
-            "values": [int(round(day_likes.get(i, 0))) for i in range(7)]
+        series = {
+            "daily": likes.groupby([mayor, dated['date'].dt.normalize()]).mean(),
+            "types": frame['likes'].groupby([frame['mayor'], frame['type']]).mean(),
+            "hours": likes.groupby([mayor, dated['date'].dt.hour // 4]).mean(),
+            "days": likes.groupby([mayor, dated['date'].dt.dayofweek]).mean(),
         }
+        self.profiles = self._materialize(series, frame['mayor'].unique())
 
+        self.regions = {}
+        if region_map is not None:
+            self.regions = self._rollup(series, region_map)
+
+    @staticmethod
+    def _materialize(series, keys):
+        nested = {name: _nested(s) for name, s in series.items()}
         return {
-            "chart_a": chart_a,
-            "chart_b": chart_b,
-            "chart_c": chart_c,
-            "chart_d": chart_d
+            key: _format_chart_data(*(nested[name].get(key, {}) for name in ("daily", "types", "hours", "days")))
+            for key in keys
         }
 
+    @classmethod
+    def _rollup(cls, series, mapping):
+        rolled = {}
+        for name, s in series.items():
+            groups = s.index.get_level_values(0).map(lambda m: mapping.get(m))
+            s = s[groups.notna()]
+            groups = groups[groups.notna()]
+            rolled[name] = s.groupby([groups, s.index.get_level_values(1)]).mean()
+        return cls._materialize(rolled, sorted(set(mapping.values())))
+
+    def get(self, name):
+        return self.profiles.get(name)
+
+def build_chart_frame():
+    """
+    Combines the chart inputs of all profiles, parsing dates once.
+    """
+    profiles = get_store().items()
+    parts = [
+        pd.DataFrame({
+            "mayor": name,
+            "date": df['Tarih'],
+            "likes": df['BeğeniSayısı'],
+            "comments": df['YorumSayısı'],
+            "type": df['PostTürü']
+        })
+        for name, df in profiles
+    ]
+    if not parts:
+        return pd.DataFrame({"mayor": [], "date": pd.to_datetime([]), "likes": [], "comments": [], "type": [], "reach": []})
+    frame = pd.concat(parts, ignore_index=True)
+    frame['date'] = parse_post_dates(frame['date'])
+
+    # Reach rate of each post against the followers at post time, as in the post index
+    reach = np.zeros(len(frame))
+    offset = 0
+    for name, df in profiles:
+        rows = slice(offset, offset + len(df))
+        reach[rows] = reach_rates(
+            df['BeğeniSayısı'] + df['YorumSayısı'],
+            post_followers(name, df, frame['date'].iloc[rows])
+        )
+        offset += len(df)
+    frame['reach'] = reach
+    return frame
+
+def get_chart_frame():
+    """
+    Returns the combined, date-parsed frame of all posts for the current data.
+    """
+    return get_derived('chart_frame')
+
+def get_chart_aggregates():
+    """
+    Returns the ChartAggregates for the current data.
+    """
+    return get_derived('chart_aggregates')
+
+def get_chart_data(name):
+    """
+    Returns the precomputed chart data of a profile, or {}.
+    """
+    return get_chart_aggregates().get(name) or {}
+
+def get_chart_comparison(name):
+    """
+    Returns the average charts of a profile's region, drawn over its own.
+    Every city has a single mayor, so there is no city average to compare with.
+    """
+    region = get_registry().region(name, None)
+    return {
+        "region": region,
+        "charts": get_chart_aggregates().regions.get(region, {})
+    }
+
+def prepare_chart_data(df):
+    """
+    Calculates data for the 4 requested charts for a single profile's DataFrame.
+    Request paths use get_chart_data(), which serves the precomputed result.
+    """
+    try:
+        frame = pd.DataFrame({
+            "mayor": "",
+            "date": parse_post_dates(df['Tarih']),
+            "likes": df['BeğeniSayısı'],
+            "type": df['PostTürü']
+        })
+        with metrics.span('prepare_chart_data'):
+            return ChartAggregates(frame).get("") or {}
+
     except Exception as e:
         print(f"Error preparing chart data: {e}")
         return {}
+
+def _build_chart_aggregates():
+    registry = get_registry()
+    return ChartAggregates(get_chart_frame(), registry.region_map)
+
+# Everything computed from all profiles at once, by get_derived() key
+DERIVED_BUILDERS = {
+    'post_index': lambda: PostIndex(build_posts_frame()),
+    'mayors_data': build_mayors_data,
+    'chart_frame': build_chart_frame,
+    'chart_aggregates': _build_chart_aggregates,
+    'timelines': lambda: PostTimelines(get_chart_frame()),
+    'post_ranking': lambda: PostRanking(get_store().items()),
+    'post_search': lambda: PostSearch(get_store().items()),
+    'anomalies': build_anomalies,
+    'anomaly_list': build_anomaly_list,
+}
@@ -0,0 +1,149 @@
+"""
+Engagement anomalies: posts whose likes + comments are far above ("viral")
+or below ("low") what their profile usually gets.
+
+Per profile, posts are ordered by date and engagement is taken on a log
+scale, minus the profile's typical offset for the post's PostTürü (a
+reel usually gets more than a photo). Each post is then compared with the
+median and MAD of the WINDOW posts before it; a robust z-score of at
+least THRESHOLD either way flags it. Posts from the last MIN_AGE before
+a profile's newest post may still be collecting likes, so they are never
+flagged as low.
+
+All profiles are scored together as flat arrays: the trailing windows are
+gathered by index arithmetic inside each profile's slice, so there is no
+per-post Python loop. AnomalyDetector keeps the scores per profile and
+only rescores profiles whose file changed.
+"""
+import threading
+import warnings
+import numpy as np
+import pandas as pd
+
+WINDOW = 30 # Previous posts in the baseline
+MIN_HISTORY = 8 # Posts a profile needs before the first one is scored
+THRESHOLD = 3.5
+MAD_SCALE = 1.4826 # MAD -> standard deviation for normal data
+MIN_SPREAD = 0.1 # In log units, so very steady profiles do not flag every small change
+MIN_AGE = 2 * 24 * 60 * 60 * 10**9 # Two days, in nanoseconds
+CHUNK_ROWS = 100000 # Rows per window matrix, bounds memory to CHUNK_ROWS * WINDOW floats
+
+def score_profiles(profiles):
+    """
+    profiles: list of (engagement, post_types, timestamps) arrays, one
+    entry per profile; timestamps are datetime64 (NaT if unknown).
+    Returns a list of (scores, expected) arrays in the rows' given order:
+    the robust z-score of each post (NaN without enough history or date)
+    and the engagement its baseline expected for its type.
+    """
+    lengths = np.array([len(engagement) for engagement, _, _ in profiles], dtype=np.intp)
+    total = int(lengths.sum())
+    if not total:
+        return [(np.array([]), np.array([])) for _ in profiles]
+
+    groups = np.repeat(np.arange(len(profiles)), lengths)
+    engagement = np.concatenate([np.asarray(e, dtype=np.float64) for e, _, _ in profiles])
+    post_types = np.concatenate([np.asarray(t, dtype=object) for _, t, _ in profiles])
+    timestamps = np.concatenate([np.asarray(ts, dtype='datetime64[ns]') for _, _, ts in profiles])
+    dated = ~np.isnat(timestamps)
+
+    # Profile by profile, oldest first; undated posts go last and are not scored
+    sort_keys = np.where(dated, timestamps.view(np.int64), np.iinfo(np.int64).max)
+    order = np.lexsort((sort_keys, groups))
+    groups = groups[order]
+    dated = dated[order]
+    sorted_timestamps = timestamps[order]
+    values = np.log1p(np.clip(engagement[order], 0, None))
+    values[~dated | np.isnan(values)] = np.nan
+
+    # Typical level of each post type relative to the profile
+    series = pd.Series(values)
+    type_codes = pd.factorize(post_types[order])[0]
+    offsets = (
+        series.groupby([groups, type_codes]).transform('median')
+        - series.groupby(groups).transform('median')
+    ).fillna(0).to_numpy()
+    adjusted = values - offsets
+
+    starts = np.repeat(np.cumsum(lengths) - lengths, lengths)
+    times = np.where(dated, sorted_timestamps.view(np.int64), np.iinfo(np.int64).min)
+    newest = pd.Series(times).groupby(groups).transform('max').to_numpy()
+    young = dated & (times > newest - MIN_AGE)
+    medians = np.empty(total)
+    spreads = np.empty(total)
+    counts = np.empty(total, dtype=np.intp)
+    steps = np.arange(-WINDOW, 0)
+    with warnings.catch_warnings():
+        # Rows without history have all-NaN windows
+        warnings.simplefilter('ignore', RuntimeWarning)
+        for lo in range(0, total, CHUNK_ROWS):
+            rows = np.arange(lo, min(lo + CHUNK_ROWS, total))
+            index = rows[:, None] + steps[None, :]
+            windows = np.where(index >= starts[rows, None], adjusted[np.maximum(index, 0)], np.nan)
+            medians[rows] = np.nanmedian(windows, axis=1)
+            spreads[rows] = np.nanmedian(np.abs(windows - medians[rows, None]), axis=1)
+            counts[rows] = np.count_nonzero(~np.isnan(windows), axis=1)
+
+    scale = np.maximum(spreads * MAD_SCALE, MIN_SPREAD)
+    scores = (adjusted - medians) / scale
+    scores[counts < MIN_HISTORY] = np.nan
+    scores[young & (scores < 0)] = np.nan
+    expected = np.expm1(medians + offsets)
+
+    # Back to the callers' row order
+    sorted_scores = np.empty(total)
+    sorted_expected = np.empty(total)
+    sorted_scores[order] = scores
+    sorted_expected[order] = expected
+    bounds = np.cumsum(lengths)[:-1]
+    return list(zip(np.split(sorted_scores, bounds), np.split(sorted_expected, bounds)))
+
+def kinds(scores, threshold=THRESHOLD):
+    """
+    Returns "viral", "low" or "" per score.
+    """
+    result = np.full(len(scores), "", dtype=object)
+    with np.errstate(invalid='ignore'):
+        result[scores >= threshold] = "viral"
+        result[scores <= -threshold] = "low"
+    return result
+
+class AnomalyDetector:
+    """
+    Scores per profile, kept between data versions. update() rescores
+    only the profiles that are new or whose file changed since the last
+    call, all of them in one score_profiles() pass.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._profiles = {}
+
+    def update(self, profiles, load):
+        """
+        profiles: {name: fingerprint} of every current profile.
+        load(name) returns the (engagement, post_types, timestamps) arrays of a profile.
+        Returns {name: (scores, expected, kinds)}, rows in the profile's row order.
+        """
+        with self._lock:
+            changed = [name for name, fingerprint in profiles.items()
+                       if self._profiles.get(name, (None,))[0] != fingerprint]
+            if changed:
+                scored = score_profiles([load(name) for name in changed])
+                for name, (scores, expected) in zip(changed, scored):
+                    self._profiles[name] = (profiles[name], scores, expected, kinds(scores))
+            for name in set(self._profiles) - set(profiles):
+                del self._profiles[name]
+            return {name: entry[1:] for name, entry in self._profiles.items()}
+
+    def state(self):
+        """
+        Returns the per-profile scores with their fingerprints, e.g. to hand
+        them to the next build in another process.
+        """
+        with self._lock:
+            return dict(self._profiles)
+
+    def restore(self, state):
+        with self._lock:
+            self._profiles = dict(state)
@@ -0,0 +1,102 @@
+"""
+Profile CSVs read straight from compressed files, without extracting them:
+*Main.csv.gz files and *Main.csv members of *.zip archives (the scrape
+ships as Datas/Datas.zip).
+
+A zip member is addressed like a file inside the archive directory,
+e.g. 'Datas/Datas.zip/Adem UzunMain.csv'.
+"""
+import os
+import re
+import gzip
+import time
+import zipfile
+import threading
+import unicodedata
+
+PROFILE_SUFFIX = 'Main.csv'
+# Some Windows zip tools store non-ASCII characters as '#U00f6'
+ESCAPED_CHAR_RE = re.compile(r'#U([0-9a-fA-F]{4})')
+UTF8_FLAG = 0x800
+
+_indexes = {}
+_indexes_lock = threading.Lock()
+
+def member_name(info):
+    """
+    Returns the real file name of a zip member, NFC-normalized.
+    """
+    name = info.filename
+    if not info.flag_bits & UTF8_FLAG:
+        # Without the UTF-8 flag zipfile decodes as cp437, but most tools wrote UTF-8
+        try:
+            name = name.encode('cp437').decode('utf-8')
+        except (UnicodeEncodeError, UnicodeDecodeError):
+            pass
+    name = ESCAPED_CHAR_RE.sub(lambda m: chr(int(m.group(1), 16)), name)
+    return unicodedata.normalize('NFC', name)
+
+def _member_fingerprint(info):
+    # (mtime_ns, size, crc): mtime first, like file fingerprints
+    try:
+        mtime = time.mktime(info.date_time + (0, 0, -1))
+    except (OverflowError, ValueError):
+        mtime = 0
+    return (int(mtime * 1e9), info.file_size, info.CRC)
+
+def members(archive_path):
+    """
+    Returns {profile name: (path, fingerprint)} for the *Main.csv members of a zip.
+    The member index is built once per version of the archive file.
+    """
+    try:
+        st = os.stat(archive_path)
+    except OSError:
+        return {}
+    fingerprint = (st.st_mtime_ns, st.st_size)
+    with _indexes_lock:
+        cached = _indexes.get(archive_path)
+    if cached is not None and cached[0] == fingerprint:
+        return cached[1]
+
+    index = {}
+    try:
+        with zipfile.ZipFile(archive_path) as zf:
+            for info in zf.infolist():
+                name = os.path.basename(member_name(info))
+                if info.is_dir() or not name.endswith(PROFILE_SUFFIX) or name.startswith('.'):
+                    continue
+                path = os.path.join(archive_path, info.filename)
+                index[name[:-len(PROFILE_SUFFIX)]] = (path, _member_fingerprint(info))
+    except (OSError, zipfile.BadZipFile) as e:
+        print(f"Error reading archive {archive_path}: {e}")
+        return {}
+
+    with _indexes_lock:
+        _indexes[archive_path] = (fingerprint, index)
+    return index
+
+def split_member_path(path):
+    """
+    Returns (archive path, member name) for a path inside a zip, or (None, None).
+    """
+    marker = '.zip' + os.sep
+    position = path.find(marker)
+    if position == -1:
+        return None, None
+    archive_path = path[:position + len('.zip')]
+    return archive_path, path[len(archive_path) + 1:]
+
+def open_binary(path):
+    """
+    Opens a profile file for streaming reads: a plain file, a .gz file,
+    or a zip member (decompressed as it is read).
+    """
+    archive_path, member = split_member_path(path)
+    if archive_path is not None:
+        # The member keeps the archive file open until it is closed itself
+        with zipfile.ZipFile(archive_path) as zf:
+            return zf.open(member)
+    if path.endswith('.gz'):
+        return gzip.open(path, 'rb')
+    return open(path, 'rb')
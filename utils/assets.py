@@ -0,0 +1,185 @@
+"""
+Build step for static/: content-hashed copies of every asset, resized
+WebP/AVIF variants of the raster images, and pre-compressed .gz/.br files
+for the text ones, described by static/dist/manifest.json.
+
+    python -m utils.assets [--clean]
+
+The app's url_for() maps url_for('static', filename=...) to the hashed
+copy when the manifest has it, so those URLs can be cached forever.
+Without a build (or for files added since) it falls back to static/.
+"""
+import io
+import os
+import sys
+import gzip
+import json
+import hashlib
+import argparse
+
+# Optional: without Pillow no image variants are made
+try:
+    from PIL import Image, features
+except ImportError:
+    Image = None
+
+# Optional: without brotli only .gz files are written
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+STATIC_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'static')
+BUILD_DIR = os.path.join(STATIC_DIR, 'dist')
+MANIFEST_PATH = os.path.join(BUILD_DIR, 'manifest.json')
+
+HASH_LENGTH = 12
+RASTER_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.webp')
+TEXT_EXTENSIONS = ('.svg', '.css', '.js', '.json', '.txt', '.html')
+WIDTHS = (320, 640, 960, 1280, 1920)
+QUALITY = {'webp': 80, 'avif': 60}
+# Content-Encoding -> file suffix, best first
+ENCODINGS = {'br': '.br', 'gzip': '.gz'}
+MIN_COMPRESS_BYTES = 512
+
+def _formats():
+    # AVIF needs Pillow 11.2+ (or the pillow-avif-plugin)
+    if Image is None:
+        return []
+    formats = ['webp'] if features.check('webp') else []
+    if features.check('avif'):
+        formats.append('avif')
+    return formats
+
+def _hashed_name(filename, digest, suffix=None):
+    base, ext = os.path.splitext(filename)
+    return f"{base}.{digest}{suffix or ext}"
+
+def _write(filename, data):
+    # Names are content-addressed: an existing file already has these bytes
+    path = os.path.join(BUILD_DIR, filename)
+    if os.path.exists(path):
+        return
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.tmp{os.getpid()}"
+    with open(tmp_path, 'wb') as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+def _compress(filename, data):
+    # Only kept when they actually save bytes
+    encodings = []
+    if len(data) < MIN_COMPRESS_BYTES:
+        return encodings
+    compressed = {'gzip': gzip.compress(data, compresslevel=9, mtime=0)}
+    if brotli is not None:
+        compressed['br'] = brotli.compress(data, quality=11)
+    for encoding, suffix in ENCODINGS.items():
+        body = compressed.get(encoding)
+        if body is not None and len(body) < len(data):
+            _write(filename + suffix, body)
+            encodings.append(encoding)
+    return encodings
+
+def _variants(filename, data, digest, formats):
+    """
+    Writes the image resized to every WIDTHS entry below its own width (and
+    at its own width) in each format. Returns (width, height, {format: [[w, file]]}).
+    """
+    with Image.open(io.BytesIO(data)) as image:
+        image.load()
+        width, height = image.size
+        if image.mode not in ('RGB', 'RGBA'):
+            image = image.convert('RGBA' if 'transparency' in image.info else 'RGB')
+        widths = [w for w in WIDTHS if w < width] + [width]
+        variants = {fmt: [] for fmt in formats}
+        for w in widths:
+            resized = image if w == width else image.resize((w, round(height * w / width)), Image.LANCZOS)
+            for fmt in formats:
+                name = _hashed_name(filename, f"{digest}-{w}w", '.' + fmt)
+                if not os.path.exists(os.path.join(BUILD_DIR, name)):
+                    out = io.BytesIO()
+                    resized.save(out, fmt.upper(), quality=QUALITY[fmt])
+                    _write(name, out.getvalue())
+                variants[fmt].append([w, name])
+    return width, height, variants
+
+def build(clean=False):
+    """
+    Processes every file under static/ (except dist/) and writes the manifest.
+    Returns the manifest.
+    """
+    formats = _formats()
+    manifest = {}
+    for root, dirs, files in os.walk(STATIC_DIR):
+        dirs[:] = sorted(d for d in dirs if os.path.join(root, d) != BUILD_DIR)
+        for name in sorted(files):
+            if name.startswith('.'):
+                continue
+            path = os.path.join(root, name)
+            filename = os.path.relpath(path, STATIC_DIR).replace(os.sep, '/')
+            with open(path, 'rb') as f:
+                data = f.read()
+            digest = hashlib.sha256(data).hexdigest()[:HASH_LENGTH]
+            hashed = _hashed_name(filename, digest)
+            _write(hashed, data)
+            entry = {'file': hashed, 'encodings': []}
+
+            ext = os.path.splitext(name)[1].lower()
+            if ext in TEXT_EXTENSIONS:
+                entry['encodings'] = _compress(hashed, data)
+            elif ext in RASTER_EXTENSIONS and formats:
+                try:
+                    entry['width'], entry['height'], entry['variants'] = _variants(filename, data, digest, formats)
+                except Exception as e:
+                    print(f"Error resizing {filename}: {e}")
+            manifest[filename] = entry
+
+    tmp_path = f"{MANIFEST_PATH}.tmp{os.getpid()}"
+    os.makedirs(BUILD_DIR, exist_ok=True)
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=1, sort_keys=True)
+    os.replace(tmp_path, MANIFEST_PATH)
+
+    if clean:
+        _clean(manifest)
+    return manifest
+
+def _clean(manifest):
+    # Files of older builds; kept by default so pages rendered before a deploy still load
+    keep = {MANIFEST_PATH}
+    for entry in manifest.values():
+        files = [entry['file']] + [name for variants in entry.get('variants', {}).values() for _, name in variants]
+        for name in files:
+            keep.add(os.path.join(BUILD_DIR, name))
+        for encoding in entry['encodings']:
+            keep.add(os.path.join(BUILD_DIR, entry['file'] + ENCODINGS[encoding]))
+    for root, _, files in os.walk(BUILD_DIR):
+        for name in files:
+            path = os.path.join(root, name)
+            if path not in keep:
+                os.remove(path)
+
+def load_manifest(path=MANIFEST_PATH):
+    """
+    Returns the manifest of the last build, or {} if there is none.
+    """
+    try:
+        with open(path, encoding='utf-8') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+    except (OSError, ValueError) as e:
+        print(f"Error reading asset manifest {path}: {e}")
+        return {}
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build hashed, compressed and resized copies of static/.")
+    parser.add_argument('--clean', action='store_true', help="Delete files of previous builds")
+    args = parser.parse_args(argv)
+    manifest = build(args.clean)
+    print(f"Built {len(manifest)} assets into {BUILD_DIR} (image formats: {', '.join(_formats()) or 'none'})")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
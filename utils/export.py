@@ -0,0 +1,244 @@
+"""
+Pre-renders every profile report to static files, off the web tier.
+
+    python -m utils.export [--out DIR] [--html] [--processes N]
+
+One export per dataset version, written next to the previous ones:
+
+    <out>/<version>/index.json                      version, names, generated_at
+    <out>/<version>/report/<name>/report.json       analyze_data(name)
+    <out>/<version>/report/<name>/kpi.json          same bodies as /api/report/<name>/...
+    <out>/<version>/report/<name>/charts.json
+    <out>/<version>/report/<name>/followers.json
+    <out>/<version>/report/<name>/top-posts.json    (only once every image is ready)
+    <out>/CURRENT                                   version of the latest complete export
+
+The app serves these files instead of computing the fragments while the
+export matches the data in Datas/. With --html every profile also gets a
+self-contained report/<name>/index.html (plus static/ and thumbnails/),
+so the export directory can be published as a static mirror.
+"""
+import os
+import sys
+import json
+import shutil
+import argparse
+import multiprocessing
+from datetime import datetime, timezone
+from concurrent.futures import ProcessPoolExecutor
+from utils import analiz
+from utils import thumbnails
+
+EXPORT_DIR = os.environ.get(
+    'EXPORT_DIR',
+    os.path.join(os.path.dirname(os.path.dirname(__file__)), 'instance', 'exports')
+)
+PROCESSES = int(os.environ.get('EXPORT_PROCESSES', str(os.cpu_count() or 1)))
+KEEP = 3 # Exports kept on disk, including the current one
+IMAGE_DEADLINE = 60 # Seconds an export waits on the thumbnails of one profile
+FRAGMENTS = ('kpi', 'charts', 'followers', 'top-posts')
+CURRENT_FILE = 'CURRENT'
+
+def _write_json(path, data):
+    tmp_path = f"{path}.tmp{os.getpid()}"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False, sort_keys=True, default=str)
+    os.replace(tmp_path, path)
+
+def profile_fragments(name, deadline=IMAGE_DEADLINE):
+    """
+    Returns {fragment: body} for a profile, the bodies the /api/report/<name>/...
+    routes send without query arguments, or None if the profile is unknown.
+    """
+    kpis = analiz.get_profile_kpis(name)
+    if kpis is None:
+        return None
+    top_posts = analiz.get_profile_top_posts(name, deadline=deadline) or []
+    return {
+        "kpi": dict(kpis, city=analiz.get_registry().city(name, "Sivas")),
+        "charts": {
+            "chart_data": analiz.get_chart_data(name),
+            "chart_comparison": analiz.get_chart_comparison(name)
+        },
+        "followers": analiz.get_follower_history(name),
+        "top-posts": {
+            "top_posts": top_posts,
+            "pending": any(not post['image'] for post in top_posts)
+        }
+    }
+
+def _render_page(name, names, fragments):
+    # Imported here: only --html needs Flask and the app's settings
+    from flask import render_template
+    from app import app
+    with app.test_request_context(f'/report/{name}/'):
+        return render_template(
+            'index.html', names=names, selected_name=name,
+            city=fragments['kpi']['city'], static_export=True,
+            prerendered={"name": name, "fragments": fragments}
+        )
+
+def _export_profile(name, out_dir, names, html, deadline):
+    """
+    Runs in a pool process: writes the files of one profile.
+    Returns (name, pending, thumbnail digests).
+    """
+    fragments = profile_fragments(name, deadline)
+    if fragments is None:
+        return name, False, []
+    profile_dir = os.path.join(out_dir, 'report', name)
+    os.makedirs(profile_dir, exist_ok=True)
+
+    kpis, charts = fragments['kpi'], fragments['charts']
+    _write_json(os.path.join(profile_dir, 'report.json'), {
+        "kpi_data": kpis['kpi_data'],
+        "top_posts": fragments['top-posts']['top_posts'],
+        "city": analiz.get_registry().city(name),
+        "chart_data": charts['chart_data'],
+        "chart_comparison": charts['chart_comparison'],
+        "trend_window": kpis['trend_window']
+    })
+    pending = fragments['top-posts']['pending']
+    for fragment in FRAGMENTS:
+        # Images that missed the deadline are left to the live route
+        if fragment == 'top-posts' and pending:
+            continue
+        _write_json(os.path.join(profile_dir, fragment + '.json'), fragments[fragment])
+
+    if html:
+        with open(os.path.join(profile_dir, 'index.html'), 'w', encoding='utf-8') as f:
+            f.write(_render_page(name, names, fragments))
+
+    digests = [
+        post['image'][len(thumbnails.URL_PREFIX):-len('.webp')]
+        for post in fragments['top-posts']['top_posts']
+        if post['image'].startswith(thumbnails.URL_PREFIX)
+    ]
+    return name, pending, digests
+
+def _copy_mirror_files(out_dir, digests):
+    # Everything the pages link to besides the CDN scripts
+    static_dir = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'static')
+    shutil.copytree(static_dir, os.path.join(out_dir, 'static'))
+    os.makedirs(os.path.join(out_dir, 'thumbnails'), exist_ok=True)
+    for digest in set(digests):
+        try:
+            shutil.copyfile(thumbnails.path_for(digest), os.path.join(out_dir, 'thumbnails', digest + '.webp'))
+        except OSError as e:
+            print(f"Error copying thumbnail {digest}: {e}")
+
+def read_current(out=EXPORT_DIR):
+    """
+    Returns the version of the latest complete export, or None.
+    """
+    try:
+        with open(os.path.join(out, CURRENT_FILE), encoding='utf-8') as f:
+            return f.read().strip() or None
+    except OSError:
+        return None
+
+def _set_current(out, version):
+    path = os.path.join(out, CURRENT_FILE)
+    tmp_path = f"{path}.tmp{os.getpid()}"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        f.write(version + '\n')
+    os.replace(tmp_path, path)
+
+def find(version, name, fragment, out=EXPORT_DIR):
+    """
+    Returns the exported file of a profile fragment if the current export
+    was built from dataset `version`, or None.
+    """
+    if fragment not in FRAGMENTS or not name or name in ('.', '..') or '/' in name or os.sep in name:
+        return None
+    if read_current(out) != version:
+        return None
+    path = os.path.join(out, version, 'report', name, fragment + '.json')
+    return path if os.path.isfile(path) else None
+
+def _prune(out, keep):
+    versions = [
+        entry.path for entry in os.scandir(out)
+        if entry.is_dir() and not entry.name.startswith('.')
+    ]
+    versions.sort(key=os.path.getmtime, reverse=True)
+    for path in versions[keep:]:
+        shutil.rmtree(path, ignore_errors=True)
+
+def export(out=EXPORT_DIR, html=False, processes=PROCESSES, force=False, deadline=IMAGE_DEADLINE):
+    """
+    Exports every profile for the current data into <out>/<version>/ and
+    makes it the current export. Returns the export directory, or None if
+    Datas/ changed while exporting.
+    """
+    version, _ = analiz.get_dataset_version()
+    target = os.path.join(out, version)
+    if os.path.isdir(target) and not force:
+        print(f"Export {version} already exists")
+        _set_current(out, version)
+        return target
+
+    # Load everything once; forked workers share it instead of parsing Datas/ again
+    analiz.warm()
+    names = analiz.get_all_names()
+    tmp_dir = os.path.join(out, f'.{version}.tmp{os.getpid()}')
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+
+    jobs = [(name, tmp_dir, names, html, deadline) for name in names]
+    if processes > 1:
+        methods = multiprocessing.get_all_start_methods()
+        context = multiprocessing.get_context('fork' if 'fork' in methods else None)
+        with ProcessPoolExecutor(max_workers=processes, mp_context=context) as pool:
+            results = list(pool.map(_export_profile, *zip(*jobs), chunksize=max(1, len(jobs) // (processes * 4))))
+    else:
+        results = [_export_profile(*job) for job in jobs]
+
+    pending = [name for name, is_pending, _ in results if is_pending]
+    if html:
+        _copy_mirror_files(tmp_dir, [digest for _, _, digests in results for digest in digests])
+        if names:
+            shutil.copyfile(
+                os.path.join(tmp_dir, 'report', names[0], 'index.html'),
+                os.path.join(tmp_dir, 'index.html')
+            )
+    _write_json(os.path.join(tmp_dir, 'index.json'), {
+        "version": version,
+        "generated_at": datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        "names": names,
+        "pending_images": pending
+    })
+
+    if analiz.get_dataset_version()[0] != version:
+        print("Datas/ changed during the export, discarding it")
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        return None
+
+    if os.path.isdir(target):
+        shutil.rmtree(target)
+    os.replace(tmp_dir, target)
+    _set_current(out, version)
+    _prune(out, KEEP)
+    if pending:
+        print(f"Top post images still missing for {len(pending)} profiles, their live routes will fill them in")
+    return target
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Pre-render every profile report to static files.")
+    parser.add_argument('--out', default=EXPORT_DIR, help="Export directory (default: %(default)s)")
+    parser.add_argument('--html', action='store_true', help="Also write the report pages, for a static mirror")
+    parser.add_argument('--processes', type=int, default=PROCESSES, help="Worker processes (default: %(default)s)")
+    parser.add_argument('--force', action='store_true', help="Rebuild even if this data was exported already")
+    parser.add_argument('--image-deadline', type=float, default=IMAGE_DEADLINE,
+                        help="Seconds to wait on each profile's images (default: %(default)s)")
+    args = parser.parse_args(argv)
+
+    os.makedirs(args.out, exist_ok=True)
+    target = export(args.out, args.html, args.processes, args.force, args.image_deadline)
+    if target is None:
+        return 1
+    print(f"Export written to {target}")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
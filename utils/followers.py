@@ -0,0 +1,209 @@
+"""
+Append-only follower history: one (profile, timestamp, followers) record
+per profile and data drop.
+
+Each *Main.csv only carries the follower count at scrape time (first row),
+so the history is built up by recording that count every time a profile
+file is ingested. Records are fixed-size and appended to one binary file
+that readers memory-map; profile names live in a sidecar file, one per line.
+When a (profile, timestamp) is recorded again, the last record wins.
+
+The file lives in instance/, which ephemeral filesystems (e.g. Heroku
+dynos) lose on every restart: point FOLLOWER_STORE at persistent storage
+such as a mounted volume. Without one the history only holds what the
+backfill rebuilds at each boot (gunicorn.conf.py runs it), i.e. the drops
+kept in Datas/, so keep older drops in Datas.zip.
+
+Backfill from every file in Datas/ (including older drops inside Datas.zip):
+    python -m utils.followers
+"""
+import os
+import sys
+import threading
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+STORE_PATH = os.environ.get(
+    'FOLLOWER_STORE',
+    os.path.join(os.path.dirname(os.path.dirname(__file__)), 'instance', 'followers.bin')
+)
+
+MAGIC = b'PACFOL01'
+RECORD = np.dtype([('profile', '<u4'), ('timestamp', '<i8'), ('followers', '<f8')])
+DAY = 24 * 60 * 60
+GRANULARITIES = ('raw', 'daily', 'weekly')
+
+class FollowerSeries:
+    """
+    One profile's follower counts, sorted by timestamp (unix seconds), one per timestamp.
+    """
+
+    def __init__(self, timestamps, values):
+        self.timestamps = timestamps
+        self.values = values
+        self._rollups = {}
+
+    def rollup(self, granularity):
+        """
+        Returns the series downsampled to the last value per day or week (weeks start on Monday).
+        """
+        if granularity == 'raw':
+            return self
+        if granularity not in self._rollups:
+            days = self.timestamps // DAY
+            # Day 0 (1970-01-01) was a Thursday
+            buckets = days if granularity == 'daily' else (days + 3) // 7
+            last = np.flatnonzero(np.r_[buckets[1:] != buckets[:-1], True]) if len(buckets) else buckets
+            starts = buckets[last] * DAY if granularity == 'daily' else (buckets[last] * 7 - 3) * DAY
+            self._rollups[granularity] = FollowerSeries(starts, self.values[last])
+        return self._rollups[granularity]
+
+    def window(self, start=None, end=None):
+        """
+        Returns (timestamps, values) in [start, end), unix seconds.
+        """
+        lo = 0 if start is None else int(np.searchsorted(self.timestamps, start, side='left'))
+        hi = len(self.timestamps) if end is None else int(np.searchsorted(self.timestamps, end, side='left'))
+        return self.timestamps[lo:hi], self.values[lo:hi]
+
+    def at(self, timestamps):
+        """
+        Follower counts at the given unix times, interpolated linearly between
+        records and held flat before the first and after the last one.
+        """
+        if not len(self.timestamps):
+            return np.full(len(timestamps), np.nan)
+        return np.interp(timestamps, self.timestamps, self.values)
+
+_EMPTY = FollowerSeries(np.array([], dtype=np.int64), np.array([], dtype=np.float64))
+
+class FollowerStore:
+    """
+    The record file plus per-profile series, re-read whenever the file grew
+    (other worker processes append to it too).
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.names_path = path + '.names'
+        self._lock = threading.Lock()
+        self._loaded_size = None
+        self._series = {}
+        self._names = []
+
+    def _read_names(self):
+        try:
+            with open(self.names_path, encoding='utf-8') as f:
+                return f.read().split('\n')[:-1]
+        except FileNotFoundError:
+            return []
+
+    def _load(self):
+        # Caller holds self._lock
+        try:
+            size = os.path.getsize(self.path)
+        except OSError:
+            size = 0
+        if size == self._loaded_size:
+            return
+        self._names = self._read_names()
+        count = max(0, (size - len(MAGIC)) // RECORD.itemsize)
+        if count:
+            records = np.memmap(self.path, dtype=RECORD, mode='r', offset=len(MAGIC), shape=(count,))
+            # Several workers may record the same drop and re-scrapes may repeat a
+            # timestamp: keep the last value per (profile, timestamp), lexsort is stable
+            order = np.lexsort((records['timestamp'], records['profile']))
+            profiles = records['profile'][order]
+            timestamps = records['timestamp'][order]
+            values = records['followers'][order]
+            keep = np.r_[(profiles[1:] != profiles[:-1]) | (timestamps[1:] != timestamps[:-1]), True]
+            profiles, timestamps, values = profiles[keep], timestamps[keep], values[keep]
+            starts = np.flatnonzero(np.r_[True, profiles[1:] != profiles[:-1]])
+            stops = np.r_[starts[1:], len(profiles)]
+            series = {}
+            for lo, hi in zip(starts, stops):
+                profile = int(profiles[lo])
+                if profile < len(self._names):
+                    series[self._names[profile]] = FollowerSeries(
+                        np.array(timestamps[lo:hi]), np.array(values[lo:hi])
+                    )
+            self._series = series
+        else:
+            self._series = {}
+        self._loaded_size = size
+
+    def _recorded(self, name, ts, value):
+        # Caller holds self._lock
+        series = self._series.get(name)
+        if series is None:
+            return False
+        i = int(np.searchsorted(series.timestamps, ts))
+        return i < len(series.timestamps) and series.timestamps[i] == ts and series.values[i] == value
+
+    def record(self, rows):
+        """
+        Appends (name, unix timestamp, followers) rows. Rows already recorded
+        are skipped; a new count for a recorded timestamp replaces the old one.
+        """
+        with self._lock:
+            self._load()
+            rows = [(name, int(ts), float(value)) for name, ts, value in rows
+                    if value > 0 and not self._recorded(name, int(ts), float(value))]
+            if not rows:
+                return 0
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            with open(self.path, 'ab') as f:
+                if fcntl is not None:
+                    fcntl.flock(f, fcntl.LOCK_EX)
+                try:
+                    # Another process may have added names since we read them
+                    names = self._read_names()
+                    ids = {name: i for i, name in enumerate(names)}
+                    new_names = []
+                    for name, _, _ in rows:
+                        if name not in ids:
+                            ids[name] = len(names) + len(new_names)
+                            new_names.append(name)
+                    if new_names:
+                        with open(self.names_path, 'a', encoding='utf-8') as names_file:
+                            names_file.write(''.join(name + '\n' for name in new_names))
+                    # Size under the lock: another process may have written the header since open()
+                    if os.fstat(f.fileno()).st_size == 0:
+                        f.write(MAGIC)
+                    records = np.array([(ids[name], ts, value) for name, ts, value in rows], dtype=RECORD)
+                    f.write(records.tobytes())
+                    f.flush()
+                finally:
+                    if fcntl is not None:
+                        fcntl.flock(f, fcntl.LOCK_UN)
+            return len(rows)
+
+    def series(self, name, granularity='raw'):
+        """
+        Returns the FollowerSeries of a profile (empty if it has no history).
+        """
+        with self._lock:
+            self._load()
+            series = self._series.get(name, _EMPTY)
+        return series.rollup(granularity)
+
+    def profiles(self):
+        with self._lock:
+            self._load()
+            return sorted(self._series)
+
+def load_store(path=STORE_PATH):
+    return FollowerStore(path)
+
+def main():
+    from utils import analiz
+    count = analiz.backfill_followers()
+    print(f"Recorded {count} follower counts in {STORE_PATH}")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
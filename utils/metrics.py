@@ -0,0 +1,210 @@
+import os
+import glob
+import time
+import pickle
+import threading
+from collections import deque
+from contextlib import contextmanager
+
+# Durations kept per series for the quantiles (most recent samples win)
+RESERVOIR_SIZE = 2048
+QUANTILES = (0.5, 0.95, 0.99)
+
+# With METRICS_DIR set every process (e.g. each gunicorn worker) writes its
+# metrics there and /metrics merges them, whichever worker gets the scrape
+SHARED_DIR = os.environ.get('METRICS_DIR')
+FLUSH_INTERVAL = float(os.environ.get('METRICS_FLUSH_INTERVAL', '5'))
+
+_lock = threading.Lock()
+_timings = {}
+_counters = {}
+_request_spans = threading.local()
+
+class Timing:
+    """
+    Count, sum and a window of recent samples for one timed series.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.samples = deque(maxlen=RESERVOIR_SIZE)
+
+    def observe(self, seconds):
+        self.count += 1
+        self.total += seconds
+        self.samples.append(seconds)
+
+def _quantiles(samples):
+    ordered = sorted(samples)
+    if not ordered:
+        return {q: 0.0 for q in QUANTILES}
+    return {q: ordered[min(len(ordered) - 1, int(q * len(ordered)))] for q in QUANTILES}
+
+def observe(metric, labels, seconds):
+    """
+    Records one duration for the series (metric, labels).
+    labels is a tuple of (name, value) pairs.
+    """
+    with _lock:
+        timing = _timings.get((metric, labels))
+        if timing is None:
+            timing = _timings[(metric, labels)] = Timing()
+        timing.observe(seconds)
+
+def increment(metric, labels, amount=1):
+    with _lock:
+        _counters[(metric, labels)] = _counters.get((metric, labels), 0) + amount
+
+def cache_event(cache, hit):
+    """
+    Counts a hit or miss for a named cache.
+    """
+    increment('pacific_cache_events_total', (('cache', cache), ('result', 'hit' if hit else 'miss')))
+
+def start_request():
+    # Spans recorded from now on are also reported in this request's Server-Timing
+    _request_spans.items = []
+
+def finish_request():
+    items = getattr(_request_spans, 'items', None)
+    _request_spans.items = None
+    return items or []
+
+@contextmanager
+def span(stage):
+    """
+    Times a named analiz stage:  with metrics.span('csv_parse'): ...
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        observe('pacific_stage_duration_seconds', (('stage', stage),), elapsed)
+        items = getattr(_request_spans, 'items', None)
+        if items is not None:
+            items.append((stage, elapsed))
+
+def server_timing_header(spans, total=None):
+    """
+    Builds a Server-Timing header value; repeated stages are summed.
+    """
+    durations = {}
+    for stage, seconds in spans:
+        durations[stage] = durations.get(stage, 0.0) + seconds
+    parts = []
+    for stage, seconds in durations.items():
+        name = ''.join(c if c.isalnum() or c in '-_' else '_' for c in stage)
+        parts.append(f'{name};dur={seconds * 1000:.2f}')
+    if total is not None:
+        parts.append(f'total;dur={total * 1000:.2f}')
+    return ', '.join(parts)
+
+def _snapshot():
+    with _lock:
+        timings = {key: (t.count, t.total, list(t.samples)) for key, t in _timings.items()}
+        counters = dict(_counters)
+    return timings, counters
+
+def flush():
+    """
+    Writes this process's metrics to SHARED_DIR/<pid>.pickle.
+    """
+    os.makedirs(SHARED_DIR, exist_ok=True)
+    path = os.path.join(SHARED_DIR, f'{os.getpid()}.pickle')
+    tmp_path = f'{path}.tmp'
+    with open(tmp_path, 'wb') as f:
+        pickle.dump(_snapshot(), f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp_path, path)
+
+def clear_shared():
+    """
+    Drops the files of earlier runs; call once before the workers start.
+    """
+    if not SHARED_DIR:
+        return
+    for path in glob.glob(os.path.join(SHARED_DIR, '*.pickle')):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+def start_sharing():
+    """
+    Flushes this process's metrics every FLUSH_INTERVAL seconds from a
+    background thread; call once per worker after the fork.
+    """
+    if not SHARED_DIR:
+        return
+
+    def run():
+        while True:
+            time.sleep(FLUSH_INTERVAL)
+            try:
+                flush()
+            except OSError as e:
+                print(f"Metrics flush failed: {e}")
+
+    threading.Thread(target=run, name='metrics-flush', daemon=True).start()
+
+def _collect():
+    # Own metrics are current; the other workers' are at most FLUSH_INTERVAL
+    # old. Files of exited workers stay in the sums so counters never go back.
+    if not SHARED_DIR:
+        return _snapshot()
+    flush()
+    timings = {}
+    counters = {}
+    for path in glob.glob(os.path.join(SHARED_DIR, '*.pickle')):
+        try:
+            with open(path, 'rb') as f:
+                process_timings, process_counters = pickle.load(f)
+        except (OSError, EOFError, pickle.UnpicklingError):
+            continue
+        for key, (count, total, samples) in process_timings.items():
+            merged = timings.setdefault(key, [0, 0.0, []])
+            merged[0] += count
+            merged[1] += total
+            merged[2].extend(samples)
+        for key, value in process_counters.items():
+            counters[key] = counters.get(key, 0) + value
+    return timings, counters
+
+def _format_labels(labels, extra=()):
+    pairs = list(labels) + list(extra)
+    if not pairs:
+        return ''
+    escaped = ','.join(
+        '{}="{}"'.format(k, str(v).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n'))
+        for k, v in pairs
+    )
+    return '{' + escaped + '}'
+
+def render_prometheus():
+    """
+    Returns all metrics in the Prometheus text format: this process's, or
+    every worker's merged when SHARED_DIR is set. Timings are exposed as
+    summaries with p50/p95/p99 quantiles over the merged recent samples.
+    """
+    timings, counters = _collect()
+    timings = {key: (count, total, _quantiles(samples)) for key, (count, total, samples) in timings.items()}
+
+    lines = []
+    for metric in sorted({m for m, _ in timings}):
+        lines.append(f'# TYPE {metric} summary')
+        for (name, labels), (count, total, quantiles) in sorted(timings.items()):
+            if name != metric:
+                continue
+            for q, value in quantiles.items():
+                lines.append(f'{metric}{_format_labels(labels, [("quantile", q)])} {value:.6f}')
+            lines.append(f'{metric}_sum{_format_labels(labels)} {total:.6f}')
+            lines.append(f'{metric}_count{_format_labels(labels)} {count}')
+
+    for metric in sorted({m for m, _ in counters}):
+        lines.append(f'# TYPE {metric} counter')
+        for (name, labels), value in sorted(counters.items()):
+            if name == metric:
+                lines.append(f'{metric}{_format_labels(labels)} {value}')
+
+    return '\n'.join(lines) + '\n'
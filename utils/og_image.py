@@ -0,0 +1,154 @@
+import os
+import re
+import html
+import time
+import sqlite3
+import threading
+import requests
+from concurrent.futures import ThreadPoolExecutor, wait
+from utils import metrics
+
+CACHE_PATH = os.environ.get(
+    'OG_IMAGE_CACHE',
+    os.path.join(os.path.dirname(os.path.dirname(__file__)), 'instance', 'og_images.db')
+)
+
+MAX_WORKERS = 4
+FETCH_TIMEOUT = 5 # Seconds per HTTP request
+DEADLINE = 3 # Seconds a page view waits for all missing images
+TTL = 6 * 60 * 60 # Instagram CDN URLs expire, so refresh them every few hours
+NEGATIVE_TTL = 10 * 60 # Retry failed links after 10 minutes
+MAX_BYTES = 512 * 1024 # og:image lives in <head>, never read further than this
+
+META_TAG_RE = re.compile(rb'<meta\b[^>]*>', re.IGNORECASE)
+ATTR_RE = re.compile(rb'([a-zA-Z:-]+)\s*=\s*(?:"([^"]*)"|\'([^\']*)\')')
+HEAD_END_RE = re.compile(rb'</head\s*>', re.IGNORECASE)
+
+_executor = ThreadPoolExecutor(max_workers=MAX_WORKERS, thread_name_prefix='og-image')
+_pending = {}
+_pending_lock = threading.Lock()
+
+def normalize_post_link(link):
+    """
+    Removes query params and ensures a trailing slash,
+    so the same post always maps to the same cache key.
+    """
+    if not link:
+        return ""
+    link = str(link).split('?')[0]
+    if not link.endswith('/'):
+        link += '/'
+    return link
+
+def _connect():
+    os.makedirs(os.path.dirname(CACHE_PATH), exist_ok=True)
+    conn = sqlite3.connect(CACHE_PATH, timeout=5)
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS og_images ("
+        "link TEXT PRIMARY KEY, image TEXT NOT NULL, fetched_at REAL NOT NULL)"
+    )
+    return conn
+
+def _cache_get(links):
+    """
+    Returns {link: image} for links with a fresh cache entry.
+    An empty image is a cached failure.
+    """
+    if not links:
+        return {}
+    now = time.time()
+    found = {}
+    try:
+        with _connect() as conn:
+            placeholders = ','.join('?' * len(links))
+            rows = conn.execute(
+                f"SELECT link, image, fetched_at FROM og_images WHERE link IN ({placeholders})",
+                list(links)
+            ).fetchall()
+    except sqlite3.Error as e:
+        print(f"Error reading og:image cache: {e}")
+        return {}
+    for link, image, fetched_at in rows:
+        ttl = TTL if image else NEGATIVE_TTL
+        if now - fetched_at < ttl:
+            found[link] = image
+    return found
+
+def _cache_put(link, image):
+    try:
+        with _connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO og_images (link, image, fetched_at) VALUES (?, ?, ?)",
+                (link, image, time.time())
+            )
+    except sqlite3.Error as e:
+        print(f"Error writing og:image cache: {e}")
+
+def extract_og_image(chunk):
+    """
+    Returns the og:image content from a (possibly partial) HTML byte string, or None.
+    """
+    for tag in META_TAG_RE.findall(chunk):
+        attrs = {}
+        for key, dq, sq in ATTR_RE.findall(tag):
+            attrs[key.lower()] = dq or sq
+        if attrs.get(b'property') == b'og:image' and b'content' in attrs:
+            return html.unescape(attrs[b'content'].decode('utf-8', errors='replace'))
+    return None
+
+def fetch_og_image(link):
+    """
+    Streams the page until the og:image tag (or </head>) is seen.
+    Returns the image URL, or "" if there is none.
+    """
+    buffer = b""
+    with requests.get(link, timeout=FETCH_TIMEOUT, stream=True) as response:
+        response.raise_for_status()
+        for chunk in response.iter_content(chunk_size=16 * 1024):
+            buffer += chunk
+            image = extract_og_image(buffer)
+            if image is not None:
+                return image
+            if HEAD_END_RE.search(buffer) or len(buffer) >= MAX_BYTES:
+                break
+    return ""
+
+def _fetch_and_store(link):
+    try:
+        image = fetch_og_image(link)
+    except Exception as e:
+        print(f"Error fetching image for {link}: {e}")
+        image = ""
+    _cache_put(link, image)
+    with _pending_lock:
+        _pending.pop(link, None)
+    return image
+
+def _submit(link):
+    # Share one in-flight fetch between concurrent requests for the same link
+    with _pending_lock:
+        future = _pending.get(link)
+        if future is None:
+            future = _executor.submit(_fetch_and_store, link)
+            _pending[link] = future
+        return future
+
+def resolve_images(links, deadline=DEADLINE):
+    """
+    Returns {normalized_link: image_url} for the given post links.
+    Cached entries are returned directly; the rest are fetched in parallel
+    and waited for at most `deadline` seconds. Links that miss the deadline
+    map to "" and keep fetching in the background, so the next view hits the cache.
+    """
+    normalized = [normalize_post_link(link) for link in links]
+    normalized = [link for link in dict.fromkeys(normalized) if link]
+
+    results = _cache_get(normalized)
+    for link in normalized:
+        metrics.cache_event('og_image', link in results)
+    futures = {link: _submit(link) for link in normalized if link not in results}
+    if futures:
+        wait(futures.values(), timeout=deadline)
+    for link, future in futures.items():
+        results[link] = future.result() if future.done() else ""
+    return results
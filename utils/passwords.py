@@ -0,0 +1,50 @@
+"""
+Password hashing off the request thread, with a cap on how much of it runs at once.
+
+scrypt takes tens of milliseconds of CPU per call (and releases the GIL
+while it runs), so a burst of logins is queued on a small pool instead of
+occupying every request thread of a worker. Beyond MAX_PENDING queued
+hashes callers get Busy and are told to retry.
+"""
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError
+from werkzeug.security import generate_password_hash, check_password_hash
+from utils import metrics
+
+HASH_METHOD = 'scrypt'
+WORKERS = int(os.environ.get('PASSWORD_HASH_WORKERS', '2')) # Hashes running at once, per process
+MAX_PENDING = int(os.environ.get('PASSWORD_HASH_QUEUE', '16')) # Running plus waiting
+TIMEOUT = 10 # Seconds a request waits for its hash
+
+_executor = ThreadPoolExecutor(max_workers=WORKERS, thread_name_prefix='password')
+_slots = threading.BoundedSemaphore(MAX_PENDING)
+
+class Busy(Exception):
+    """
+    Raised when too many password hashes are already queued.
+    """
+
+def _run(func, *args):
+    if not _slots.acquire(blocking=False):
+        metrics.increment('pacific_password_hash_rejected_total', ())
+        raise Busy()
+    try:
+        future = _executor.submit(func, *args)
+    except BaseException:
+        _slots.release()
+        raise
+    # The slot stays taken until the hash is done, even if the request gave up on it
+    future.add_done_callback(lambda _: _slots.release())
+    try:
+        with metrics.span('password_hash'):
+            return future.result(timeout=TIMEOUT)
+    except TimeoutError:
+        metrics.increment('pacific_password_hash_rejected_total', ())
+        raise Busy()
+
+def hash_password(password):
+    return _run(generate_password_hash, password, HASH_METHOD)
+
+def check_password(pwhash, password):
+    return _run(check_password_hash, pwhash, password)
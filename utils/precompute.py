@@ -0,0 +1,246 @@
+import os
+import glob
+import time
+import pickle
+import hashlib
+import threading
+import functools
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from utils import analiz
+from utils import metrics
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+POLL_INTERVAL = float(os.environ.get('PRECOMPUTE_INTERVAL', '5')) # Seconds between Datas/ checks
+# Builds run in a separate process so they never hold the GIL of a serving worker.
+# 0 builds in the precompute thread instead.
+PROCESSES = int(os.environ.get('PRECOMPUTE_PROCESSES', '1'))
+# Results of the last builds, one file per dataset version. One worker builds,
+# the others load its file instead of building the same data again.
+SHARED_DIR = os.environ.get(
+    'PRECOMPUTE_DIR',
+    os.path.join(os.path.dirname(os.path.dirname(__file__)), 'instance', 'precompute')
+)
+KEEP = 2 # Result files kept on disk
+LOCK_FILE = 'build.lock'
+# Pickled results only fit the code that wrote them, so a deploy starts over
+CODE_STAMP = hashlib.sha1(repr(sorted(
+    (path, os.path.getmtime(path)) for path in glob.glob(os.path.join(os.path.dirname(__file__), '*.py'))
+)).encode('utf-8')).hexdigest()[:8]
+
+def _build_in_child(shared_dir=SHARED_DIR):
+    """
+    Runs in the pool process (or the precompute thread): loads the current
+    data and builds every derived result. Anomaly scores of profiles whose
+    file did not change are carried over from the previous build.
+    Returns (get_dataset_version(), results, frames); frames holds every
+    parsed profile, pickled one by one so workers only unpickle what changed.
+    """
+    state = load_anomaly_state(shared_dir)
+    if state is not None:
+        analiz.get_anomaly_detector().restore(state)
+    dataset_version = analiz.get_dataset_version()
+    results = analiz.build_all_derived()
+    save_anomaly_state(shared_dir)
+    frames = {
+        name: (path, fingerprint, pickle.dumps(df, protocol=pickle.HIGHEST_PROTOCOL))
+        for name, path, fingerprint, df in analiz.get_store().entries()
+    }
+    return dataset_version, results, frames
+
+def _anomaly_state_path(shared_dir=SHARED_DIR):
+    return os.path.join(shared_dir, f"anomalies-{CODE_STAMP}.state")
+
+def load_anomaly_state(shared_dir=SHARED_DIR):
+    """
+    Returns the anomaly scores the last build left in shared_dir, or None.
+    """
+    try:
+        with open(_anomaly_state_path(shared_dir), 'rb') as f:
+            return pickle.load(f)
+    except FileNotFoundError:
+        return None
+    except Exception as e:
+        print(f"Error reading anomaly state: {e}")
+        return None
+
+def save_anomaly_state(shared_dir=SHARED_DIR):
+    """
+    Writes this process's anomaly scores for the next build, wherever it runs.
+    """
+    path = _anomaly_state_path(shared_dir)
+    tmp_path = f"{path}.tmp{os.getpid()}"
+    try:
+        os.makedirs(shared_dir, exist_ok=True)
+        with open(tmp_path, 'wb') as f:
+            pickle.dump(analiz.get_anomaly_detector().state(), f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path)
+    except OSError as e:
+        print(f"Error saving anomaly state: {e}")
+
+def _shared_path(version, shared_dir=SHARED_DIR):
+    return os.path.join(shared_dir, f"{version}-{CODE_STAMP}.pickle")
+
+def load_shared(version, shared_dir=SHARED_DIR):
+    """
+    Returns the (dataset_version, results, frames) some process built for `version`, or None.
+    """
+    try:
+        with open(_shared_path(version, shared_dir), 'rb') as f:
+            return pickle.load(f)
+    except FileNotFoundError:
+        return None
+    except Exception as e:
+        print(f"Error reading precomputed results {version}: {e}")
+        return None
+
+def save_shared(built, results, frames, shared_dir=SHARED_DIR):
+    """
+    Writes the results of a build for the other workers and drops old ones.
+    """
+    path = _shared_path(built[0], shared_dir)
+    tmp_path = f"{path}.tmp{os.getpid()}"
+    with open(tmp_path, 'wb') as f:
+        pickle.dump((built, results, frames), f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp_path, path)
+    files = sorted(glob.glob(os.path.join(shared_dir, '*.pickle')), key=os.path.getmtime, reverse=True)
+    for old in files[KEEP:]:
+        try:
+            os.remove(old)
+        except OSError:
+            pass
+
+def _try_lock(shared_dir=SHARED_DIR):
+    # Returns the open lock file if this process may build, None while another one builds.
+    # Without fcntl every process builds for itself.
+    os.makedirs(shared_dir, exist_ok=True)
+    lock = open(os.path.join(shared_dir, LOCK_FILE), 'a')
+    if fcntl is not None:
+        try:
+            fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            lock.close()
+            return None
+    return lock
+
+class Precomputer:
+    """
+    Watches Datas/ from a daemon thread and installs fresh derived caches
+    (post index, rankings, search, chart aggregates, ...) off the request path.
+    Requests keep reading the previous results until the new ones are swapped in.
+    Across worker processes only the one holding the build lock builds a
+    data version; the others load its results from SHARED_DIR.
+    """
+
+    def __init__(self, interval=POLL_INTERVAL, processes=PROCESSES, shared_dir=SHARED_DIR):
+        self.interval = interval
+        self.processes = processes
+        self.shared_dir = shared_dir
+        self._thread = None
+        self._stop = threading.Event()
+        self._installed = None
+
+    def start(self):
+        if self._thread is not None:
+            return
+        analiz.set_background_refresh(True)
+        self._thread = threading.Thread(target=self._run, name='precompute', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        analiz.set_background_refresh(False)
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self.tick()
+            except Exception as e:
+                print(f"Error precomputing derived data: {e}")
+            self._stop.wait(self.interval)
+
+    def _build(self):
+        # Returns (dataset_version, results, frames) for the current data
+        if not self.processes:
+            return _build_in_child(self.shared_dir)
+        # spawn, not fork: the worker may already run other threads.
+        # The pool only lives for one build, so an idle worker holds no second copy of the data.
+        context = multiprocessing.get_context('spawn')
+        with ProcessPoolExecutor(max_workers=1, mp_context=context) as pool:
+            return pool.submit(_build_in_child, self.shared_dir).result()
+
+    def tick(self):
+        """
+        Installs the derived results if Datas/ changed since the last install,
+        building them unless another process already did.
+        Returns True when new results were installed.
+        """
+        version, _ = analiz.get_dataset_version()
+        if version == self._installed:
+            return False
+
+        start = time.perf_counter()
+        shared = load_shared(version, self.shared_dir)
+        if shared is None:
+            lock = _try_lock(self.shared_dir)
+            if lock is None:
+                # Another worker is building, its file is picked up on a later tick
+                return False
+            try:
+                # It may have finished while this one was checking
+                shared = load_shared(version, self.shared_dir)
+                if shared is None:
+                    shared = self._build()
+                    metrics.observe('pacific_precompute_duration_seconds', (), time.perf_counter() - start)
+                    try:
+                        save_shared(*shared, shared_dir=self.shared_dir)
+                    except OSError as e:
+                        print(f"Error saving precomputed results: {e}")
+            finally:
+                lock.close()
+        built, results, frames = shared
+
+        # Per-profile reports read the store of this process: take over the
+        # frames the build parsed rather than parsing the changed files again
+        analiz.get_store().install({
+            name: (path, fingerprint, functools.partial(pickle.loads, payload))
+            for name, (path, fingerprint, payload) in frames.items()
+        })
+        analiz.get_registry()
+        if analiz.get_dataset_version()[0] != built[0]:
+            # Files changed while building, try again on the next tick
+            return False
+        analiz.install_derived(results, built)
+        self._installed = built[0]
+        return True
+
+_precomputer = None
+_warmed_version = None
+
+def warm():
+    """
+    Builds every derived cache in this process, e.g. in the gunicorn master before forking.
+    """
+    global _warmed_version
+    _warmed_version = analiz.warm()[0]
+    # The first build in a worker then only rescores profiles that changed
+    save_anomaly_state()
+
+def start():
+    """
+    Starts the process-wide precomputer (once per worker).
+    """
+    global _precomputer
+    if _precomputer is None:
+        _precomputer = Precomputer()
+        # Caches inherited from a warmed master need no rebuild
+        _precomputer._installed = _warmed_version
+        _precomputer.start()
+    return _precomputer
@@ -0,0 +1,139 @@
+import re
+from bisect import bisect_left
+import numpy as np
+
+# Turkish dotted/dotless i must be handled before str.lower():
+# 'I'.lower() is 'i' and 'İ'.lower() is 'i̇' (with a combining dot)
+_TURKISH_UPPER = str.maketrans({'İ': 'i', 'I': 'ı'})
+# Users type without Turkish letters, so index and query ASCII-folded forms
+_ASCII_FOLD = str.maketrans({'ç': 'c', 'ğ': 'g', 'ı': 'i', 'ö': 'o', 'ş': 's', 'ü': 'u', 'â': 'a', 'î': 'i', 'û': 'u'})
+
+WORD_RE = re.compile(r'#?\w+', re.UNICODE)
+FACET_LIMIT = 10
+
+def turkish_lower(text):
+    """
+    Lowercases with Turkish rules (İ -> i, I -> ı).
+    """
+    return text.translate(_TURKISH_UPPER).lower()
+
+def fold(text):
+    """
+    Search key of a text: Turkish lowercase, then ASCII-folded.
+    """
+    return turkish_lower(text).translate(_ASCII_FOLD)
+
+def tokenize(text):
+    """
+    Returns (words, hashtags) of a text, folded. Hashtag words are also words.
+    """
+    words = []
+    hashtags = []
+    for token in WORD_RE.findall(fold(text)):
+        if token.startswith('#'):
+            token = token[1:]
+            if token:
+                hashtags.append(token)
+        if token:
+            words.append(token)
+    return words, hashtags
+
+class SearchIndex:
+    """
+    Inverted index over post captions. Every query token is a prefix match
+    (search-as-you-type), tokens are ANDed, and '#tag' tokens only match hashtags.
+    """
+
+    def __init__(self, captions, mayors, regions):
+        """
+        captions, mayors and regions are parallel lists, one entry per post.
+        """
+        postings = {}
+        tag_postings = {}
+        # Hashtags of each post in CSR form, for facet counts
+        self.hashtag_names = []
+        hashtag_ids = {}
+        indptr = [0]
+        indices = []
+
+        for doc, caption in enumerate(captions):
+            words, hashtags = tokenize(caption or "")
+            for word in set(words):
+                postings.setdefault(word, []).append(doc)
+            for tag in set(hashtags):
+                tag_postings.setdefault(tag, []).append(doc)
+                if tag not in hashtag_ids:
+                    hashtag_ids[tag] = len(self.hashtag_names)
+                    self.hashtag_names.append(tag)
+                indices.append(hashtag_ids[tag])
+            indptr.append(len(indices))
+
+        self.size = len(captions)
+        self.vocabulary = sorted(postings)
+        self.postings = [np.array(postings[w], dtype=np.int32) for w in self.vocabulary]
+        self.tag_vocabulary = sorted(tag_postings)
+        self.tag_postings = [np.array(tag_postings[t], dtype=np.int32) for t in self.tag_vocabulary]
+        self.hashtag_indptr = np.array(indptr, dtype=np.int64)
+        self.hashtag_indices = np.array(indices, dtype=np.int32)
+
+        self.mayor_names, self.mayor_codes = np.unique(np.array(mayors, dtype=object), return_inverse=True)
+        self.region_names, self.region_codes = np.unique(np.array(regions, dtype=object), return_inverse=True)
+
+    @staticmethod
+    def _prefix(vocabulary, postings, prefix):
+        # Union of the postings of every term starting with prefix
+        lo = bisect_left(vocabulary, prefix)
+        hi = bisect_left(vocabulary, prefix + '\uffff')
+        if hi - lo == 1:
+            return postings[lo]
+        if hi == lo:
+            return np.array([], dtype=np.int32)
+        return np.unique(np.concatenate(postings[lo:hi]))
+
+    def match(self, query):
+        """
+        Returns the sorted doc ids matching every token of the query.
+        """
+        result = None
+        for token in WORD_RE.findall(fold(query)):
+            if token.startswith('#'):
+                if len(token) == 1:
+                    continue
+                docs = self._prefix(self.tag_vocabulary, self.tag_postings, token[1:])
+            else:
+                docs = self._prefix(self.vocabulary, self.postings, token)
+            result = docs if result is None else np.intersect1d(result, docs, assume_unique=True)
+            if not len(result):
+                break
+        if result is None:
+            return np.array([], dtype=np.int32)
+        return result
+
+    def facets(self, docs, limit=FACET_LIMIT):
+        """
+        Returns match counts per mayor, region and hashtag (top `limit` each).
+        """
+        def top(names, counts):
+            best = np.argsort(-counts, kind='stable')[:limit]
+            return {str(names[i]): int(counts[i]) for i in best if counts[i] > 0}
+
+        if not len(docs):
+            return {"mayor": {}, "region": {}, "hashtag": {}}
+
+        mayor_counts = np.bincount(self.mayor_codes[docs], minlength=len(self.mayor_names))
+        region_counts = np.bincount(self.region_codes[docs], minlength=len(self.region_names))
+
+        starts = self.hashtag_indptr[docs]
+        stops = self.hashtag_indptr[docs + 1]
+        lengths = stops - starts
+        if lengths.sum():
+            positions = np.repeat(stops - lengths.cumsum(), lengths) + np.arange(lengths.sum())
+            tag_counts = np.bincount(self.hashtag_indices[positions], minlength=len(self.hashtag_names))
+        else:
+            tag_counts = np.zeros(len(self.hashtag_names), dtype=np.int64)
+
+        return {
+            "mayor": top(self.mayor_names, mayor_counts),
+            "region": top(self.region_names, region_counts),
+            "hashtag": top(np.array(self.hashtag_names, dtype=object), tag_counts)
+        }
@@ -0,0 +1,201 @@
+"""
+Binary columnar snapshot of the Datas/ directory.
+
+All *Main.csv files are stored back to back in one file: numeric columns
+as float64 arrays, text columns as a UTF-8 string table (one blob plus
+an offsets array and a null mask). Readers memory-map the file, so every
+gunicorn worker shares the same pages through the OS cache.
+
+Build it with:  python -m utils.snapshot
+"""
+import os
+import sys
+import json
+import mmap
+import numpy as np
+import pandas as pd
+
+MAGIC = b'PACSNAP1'
+ALIGN = 64
+
+def _pad(n):
+    return (ALIGN - n % ALIGN) % ALIGN
+
+def _encode_strings(values):
+    """
+    Returns (blob, offsets, mask) for a list of str/None values.
+    """
+    mask = np.array([v is None for v in values], dtype=np.uint8)
+    encoded = [b'' if v is None else v.encode('utf-8') for v in values]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    np.cumsum([len(b) for b in encoded], out=offsets[1:])
+    return b''.join(encoded), offsets, mask
+
+def _column_values(series):
+    return [None if pd.isna(v) else str(v) for v in series.tolist()]
+
+def write_snapshot(path, profiles, tags, numeric_columns):
+    """
+    Writes a snapshot atomically.
+    profiles: {name: (fingerprint, DataFrame)}
+    tags: (fingerprint, DataFrame) for profile_tags.csv, or None
+    numeric_columns: columns stored as float64, every other column is text
+    """
+    names = sorted(profiles)
+    frames = [profiles[name][1] for name in names]
+    columns = []
+    for df in frames:
+        for col in df.columns:
+            if col not in columns:
+                columns.append(col)
+
+    combined = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(columns=columns)
+
+    header = {'rows': len(combined), 'profiles': {}, 'columns': {}, 'tags': None}
+    start = 0
+    for name, df in zip(names, frames):
+        header['profiles'][name] = {
+            'fingerprint': list(profiles[name][0]),
+            'start': start,
+            'stop': start + len(df),
+            'columns': list(df.columns)
+        }
+        start += len(df)
+
+    if tags is not None:
+        fingerprint, tags_df = tags
+        header['tags'] = {
+            'fingerprint': list(fingerprint),
+            'columns': list(tags_df.columns),
+            'rows': [_column_values(row) for _, row in tags_df.astype(object).iterrows()]
+        }
+
+    # Lay out the column buffers after the header
+    buffers = []
+    offset = 0
+
+    def add(buf):
+        nonlocal offset
+        buf = bytes(buf)
+        position = offset
+        buffers.append(buf + b'\0' * _pad(len(buf)))
+        offset += len(buf) + _pad(len(buf))
+        return position, len(buf)
+
+    for col in columns:
+        if col in numeric_columns:
+            values = pd.to_numeric(combined[col], errors='coerce').to_numpy(dtype=np.float64)
+            data_offset, _ = add(values.tobytes())
+            header['columns'][col] = {'kind': 'numeric', 'offset': data_offset}
+        else:
+            blob, offsets, mask = _encode_strings(_column_values(combined[col]))
+            data_offset, data_length = add(blob)
+            offsets_offset, _ = add(offsets.tobytes())
+            mask_offset, _ = add(mask.tobytes())
+            header['columns'][col] = {
+                'kind': 'string',
+                'data_offset': data_offset,
+                'data_length': data_length,
+                'offsets_offset': offsets_offset,
+                'mask_offset': mask_offset
+            }
+
+    header_bytes = json.dumps(header, ensure_ascii=False).encode('utf-8')
+    preamble_length = len(MAGIC) + 8 + len(header_bytes)
+    header_bytes += b' ' * _pad(preamble_length)
+    data_start = len(MAGIC) + 8 + len(header_bytes)
+
+    tmp_path = f"{path}.tmp{os.getpid()}"
+    with open(tmp_path, 'wb') as f:
+        f.write(MAGIC)
+        f.write(np.uint64(len(header_bytes)).tobytes())
+        f.write(header_bytes)
+        assert f.tell() == data_start
+        for buf in buffers:
+            f.write(buf)
+    os.replace(tmp_path, path)
+
+class Snapshot:
+    """
+    Read-only, memory-mapped view of a snapshot file.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if self._mm[:len(MAGIC)] != MAGIC:
+            raise ValueError(f"{path} is not a snapshot file")
+        header_length = int(np.frombuffer(self._mm, dtype=np.uint64, count=1, offset=len(MAGIC))[0])
+        header_start = len(MAGIC) + 8
+        self.header = json.loads(bytes(self._mm[header_start:header_start + header_length]))
+        self._data_start = header_start + header_length
+        self.rows = self.header['rows']
+
+    def _numeric(self, info, start, stop):
+        return np.frombuffer(
+            self._mm, dtype=np.float64, count=stop - start,
+            offset=self._data_start + info['offset'] + start * 8
+        )
+
+    def _strings(self, info, start, stop):
+        base = self._data_start
+        offsets = np.frombuffer(self._mm, dtype=np.int64, count=self.rows + 1, offset=base + info['offsets_offset'])
+        mask = np.frombuffer(self._mm, dtype=np.uint8, count=self.rows, offset=base + info['mask_offset'])
+        data = base + info['data_offset']
+        values = []
+        for i in range(start, stop):
+            if mask[i]:
+                values.append(None)
+            else:
+                values.append(self._mm[data + offsets[i]:data + offsets[i + 1]].decode('utf-8'))
+        return values
+
+    def frame(self, name, fingerprint):
+        """
+        Returns the profile's DataFrame, or None if the profile is missing
+        or its CSV changed since the snapshot was built.
+        Numeric columns point straight into the shared mapping.
+        """
+        info = self.header['profiles'].get(name)
+        if info is None or tuple(info['fingerprint']) != tuple(fingerprint):
+            return None
+        start, stop = info['start'], info['stop']
+        data = {}
+        for col in info['columns']:
+            column = self.header['columns'][col]
+            if column['kind'] == 'numeric':
+                data[col] = self._numeric(column, start, stop)
+            else:
+                data[col] = pd.Series(self._strings(column, start, stop), dtype=object)
+        return pd.DataFrame(data, copy=False)
+
+    def tags(self, fingerprint):
+        """
+        Returns profile_tags.csv as a DataFrame, or None if it is stale.
+        """
+        tags = self.header['tags']
+        if tags is None or tuple(tags['fingerprint']) != tuple(fingerprint):
+            return None
+        return pd.DataFrame(tags['rows'], columns=tags['columns'])
+
+def load_snapshot(path):
+    """
+    Opens the snapshot at `path`, or returns None if there is none.
+    """
+    if not os.path.exists(path):
+        return None
+    try:
+        return Snapshot(path)
+    except Exception as e:
+        print(f"Error opening snapshot {path}: {e}")
+        return None
+
+def main():
+    from utils import analiz
+    path = analiz.build_snapshot()
+    print(f"Snapshot written to {path}")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
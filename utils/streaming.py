@@ -0,0 +1,76 @@
+import json
+import zlib
+
+# Optional fast paths: orjson for encoding, brotli for compression
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+def dumps(obj):
+    """
+    Encodes obj as compact UTF-8 JSON bytes.
+    """
+    if orjson is not None:
+        return orjson.dumps(obj)
+    return json.dumps(obj, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+def supported_encodings():
+    """
+    Content-Encodings we can produce, best first.
+    """
+    encodings = ['gzip']
+    if brotli is not None:
+        encodings.insert(0, 'br')
+    return encodings
+
+def compress(chunks, encoding):
+    """
+    Compresses a stream of byte chunks on the fly.
+    """
+    if encoding == 'br':
+        compressor = brotli.Compressor(quality=5)
+        for chunk in chunks:
+            out = compressor.process(chunk)
+            if out:
+                yield out
+        yield compressor.finish()
+    elif encoding == 'gzip':
+        compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+        for chunk in chunks:
+            out = compressor.compress(chunk)
+            if out:
+                yield out
+        yield compressor.flush()
+    else:
+        yield from chunks
+
+def json_rows(chunks, fields, compact=False):
+    """
+    Streams {"data": [{...}, ...]} from chunks of row tuples.
+    With compact=True streams {"columns": [...], "rows": [[...], ...]} instead,
+    which does not repeat the keys on every row.
+    """
+    if compact:
+        yield b'{"columns":' + dumps(fields) + b',"rows":['
+    else:
+        yield b'{"data":['
+
+    first = True
+    for rows in chunks:
+        if not rows:
+            continue
+        if compact:
+            body = dumps([list(row) for row in rows])
+        else:
+            body = dumps([dict(zip(fields, row)) for row in rows])
+        # Strip the list brackets so chunks join into one array
+        yield (b'' if first else b',') + body[1:-1]
+        first = False
+
+    yield b']}'
@@ -0,0 +1,252 @@
+import io
+import os
+import time
+import hashlib
+import sqlite3
+import threading
+import requests
+from urllib.parse import urlsplit, parse_qs
+from concurrent.futures import ThreadPoolExecutor, wait
+from utils import og_image
+from utils import metrics
+
+# Optional: without Pillow the report falls back to hotlinking og:image URLs
+try:
+    from PIL import Image, ImageOps
+except ImportError:
+    Image = None
+
+CACHE_DIR = os.environ.get(
+    'THUMBNAIL_CACHE',
+    os.path.join(os.path.dirname(os.path.dirname(__file__)), 'instance', 'thumbnails')
+)
+INDEX_PATH = os.path.join(CACHE_DIR, 'index.db')
+URL_PREFIX = '/thumbnails/'
+MAX_CACHE_BYTES = int(os.environ.get('THUMBNAIL_CACHE_BYTES', str(512 * 1024 * 1024)))
+
+# Bounding boxes (width, height) of the cards that show post images, at 2x for HiDPI screens
+SIZES = {
+    'card': (540, 720)
+}
+WEBP_QUALITY = 80
+
+MAX_WORKERS = 4
+FETCH_TIMEOUT = 10 # Seconds per image download
+MAX_SOURCE_BYTES = 15 * 1024 * 1024
+NEGATIVE_TTL = 10 * 60 # Retry failed posts after 10 minutes
+
+_executor = ThreadPoolExecutor(max_workers=MAX_WORKERS, thread_name_prefix='thumbnail')
+_pending = {}
+_pending_lock = threading.Lock()
+_evict_lock = threading.Lock()
+
+def available():
+    return Image is not None
+
+def _connect():
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    conn = sqlite3.connect(INDEX_PATH, timeout=5)
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS thumbnails ("
+        "link TEXT NOT NULL, size TEXT NOT NULL, digest TEXT NOT NULL, "
+        "bytes INTEGER NOT NULL, created_at REAL NOT NULL, accessed_at REAL NOT NULL, "
+        "PRIMARY KEY (link, size))"
+    )
+    conn.execute("CREATE INDEX IF NOT EXISTS thumbnails_digest ON thumbnails (digest)")
+    return conn
+
+def url(digest):
+    """
+    Returns the app URL of a thumbnail (see the /thumbnails route), or "" for none.
+    """
+    return f"{URL_PREFIX}{digest}.webp" if digest else ""
+
+def path_for(digest):
+    """
+    Returns the file of a thumbnail, sharded by the first two hex digits.
+    """
+    return os.path.join(CACHE_DIR, digest[:2], digest + '.webp')
+
+def _index_get(links, size):
+    """
+    Returns {link: digest} for cached thumbnails (and recent failures, as "")
+    and marks them as recently used.
+    """
+    if not links:
+        return {}
+    now = time.time()
+    found = {}
+    try:
+        with _connect() as conn:
+            placeholders = ','.join('?' * len(links))
+            rows = conn.execute(
+                f"SELECT link, digest, created_at FROM thumbnails WHERE size = ? AND link IN ({placeholders})",
+                [size] + list(links)
+            ).fetchall()
+            for link, digest, created_at in rows:
+                if digest and os.path.exists(path_for(digest)):
+                    found[link] = digest
+                elif not digest and now - created_at < NEGATIVE_TTL:
+                    found[link] = ""
+            hits = [(now, size, link) for link, digest in found.items() if digest]
+            conn.executemany("UPDATE thumbnails SET accessed_at = ? WHERE size = ? AND link = ?", hits)
+    except sqlite3.Error as e:
+        print(f"Error reading thumbnail index: {e}")
+        return {}
+    return found
+
+def _index_put(link, size, digest, nbytes):
+    now = time.time()
+    try:
+        with _connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO thumbnails (link, size, digest, bytes, created_at, accessed_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (link, size, digest, nbytes, now, now)
+            )
+    except sqlite3.Error as e:
+        print(f"Error writing thumbnail index: {e}")
+
+def _source_expired(url):
+    # Instagram CDN URLs carry their expiry as a hex unix time in the oe= parameter
+    try:
+        expires = int(parse_qs(urlsplit(url).query)['oe'][0], 16)
+    except (KeyError, ValueError):
+        return False
+    return expires < time.time() + 60
+
+def download_image(url):
+    """
+    Returns the bytes of a remote image, refusing anything over MAX_SOURCE_BYTES.
+    """
+    data = b""
+    with requests.get(url, timeout=FETCH_TIMEOUT, stream=True) as response:
+        response.raise_for_status()
+        for chunk in response.iter_content(chunk_size=64 * 1024):
+            data += chunk
+            if len(data) > MAX_SOURCE_BYTES:
+                raise ValueError(f"image larger than {MAX_SOURCE_BYTES} bytes")
+    return data
+
+def make_thumbnail(data, size):
+    """
+    Resizes image bytes to fit the bounding box of `size` and encodes them as WebP.
+    """
+    with Image.open(io.BytesIO(data)) as image:
+        image = ImageOps.exif_transpose(image)
+        if image.mode not in ('RGB', 'RGBA'):
+            image = image.convert('RGB')
+        image.thumbnail(SIZES[size], Image.LANCZOS)
+        out = io.BytesIO()
+        image.save(out, 'WEBP', quality=WEBP_QUALITY, method=4)
+    return out.getvalue()
+
+def _store(data):
+    # Content-addressed: the same picture is stored once, whatever post it came from
+    digest = hashlib.sha256(data).hexdigest()[:32]
+    path = path_for(digest)
+    if not os.path.exists(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+    return digest
+
+def _sources(link, display_photo):
+    # The DisplayPhoto URL from the CSV, while its signature is valid, then the post's og:image
+    if display_photo and not _source_expired(display_photo):
+        yield display_photo
+    image = og_image.resolve_images([link], deadline=og_image.FETCH_TIMEOUT).get(link)
+    if image:
+        yield image
+
+def _build(link, display_photo, size):
+    digest = ""
+    nbytes = 0
+    try:
+        for source in _sources(link, display_photo):
+            try:
+                with metrics.span('thumbnail_download'):
+                    data = download_image(source)
+            except Exception as e:
+                print(f"Error downloading image for {link}: {e}")
+                continue
+            with metrics.span('thumbnail_resize'):
+                thumbnail = make_thumbnail(data, size)
+            digest = _store(thumbnail)
+            nbytes = len(thumbnail)
+            break
+    except Exception as e:
+        print(f"Error creating thumbnail for {link}: {e}")
+    _index_put(link, size, digest, nbytes)
+    if digest:
+        evict()
+    with _pending_lock:
+        _pending.pop((link, size), None)
+    return digest
+
+def _submit(link, display_photo, size):
+    # Share one in-flight build between concurrent requests for the same post
+    with _pending_lock:
+        future = _pending.get((link, size))
+        if future is None:
+            future = _executor.submit(_build, link, display_photo, size)
+            _pending[(link, size)] = future
+        return future
+
+def resolve(posts, size='card', deadline=og_image.DEADLINE):
+    """
+    Returns {normalized_link: digest} for (post_link, display_photo) pairs.
+    Missing thumbnails are built in parallel and waited for at most
+    `deadline` seconds; the ones that miss it map to "" and keep building
+    in the background, so the next view finds them.
+    """
+    sources = {}
+    for link, display_photo in posts:
+        link = og_image.normalize_post_link(link)
+        if link:
+            sources.setdefault(link, display_photo)
+
+    results = _index_get(list(sources), size)
+    for link in sources:
+        metrics.cache_event('thumbnail', link in results)
+    futures = {link: _submit(link, sources[link], size) for link in sources if link not in results}
+    if futures:
+        wait(futures.values(), timeout=deadline)
+    for link, future in futures.items():
+        results[link] = future.result() if future.done() else ""
+    return results
+
+def evict(max_bytes=MAX_CACHE_BYTES):
+    """
+    Deletes the least recently used thumbnails until the cache is
+    back under 90% of max_bytes.
+    """
+    with _evict_lock:
+        try:
+            with _connect() as conn:
+                # One file may back several posts, count it once
+                files = conn.execute(
+                    "SELECT digest, MAX(bytes), MAX(accessed_at) FROM thumbnails "
+                    "WHERE digest != '' GROUP BY digest ORDER BY MAX(accessed_at)"
+                ).fetchall()
+                total = sum(nbytes for _, nbytes, _ in files)
+                if total <= max_bytes:
+                    return 0
+                removed = 0
+                for digest, nbytes, _ in files:
+                    if total <= max_bytes * 0.9:
+                        break
+                    try:
+                        os.remove(path_for(digest))
+                    except FileNotFoundError:
+                        pass
+                    conn.execute("DELETE FROM thumbnails WHERE digest = ?", (digest,))
+                    total -= nbytes
+                    removed += 1
+        except sqlite3.Error as e:
+            print(f"Error evicting thumbnails: {e}")
+            return 0
+    metrics.increment('pacific_thumbnails_evicted_total', (), removed)
+    return removed